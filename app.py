@@ -1,11 +1,14 @@
 import streamlit as st
-import os
-import tempfile
+import time
 import uuid
 from datetime import datetime
-from langchain_core.messages import HumanMessage
-from src.graph import app as graph_app
-from src.rag import ingest_pdf, delete_namespace 
+from src.graph import app as graph_app, turn_input, compact_later, warm_up
+from src.conversation import thread_config
+from src.rag import delete_namespace, namespace_registry
+from src.namespaces import NamespaceSweeper
+from src.jobs import ingest_jobs, spool_upload, QuotaExceeded
+from src.telemetry import start_metrics_server
+from src.config import METRICS_PORT
 
 # Page configuration
 st.set_page_config(
@@ -160,11 +163,34 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+# Models and clients are loaded once per server process and shared by every session and rerun
+@st.cache_resource(show_spinner="Loading models...")
+def load_resources():
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    # Deletes sessions whose tab was closed without 'End Session' once they have been idle for the TTL
+    def sweep_delete(namespace):
+        if not delete_namespace(namespace):
+            return False
+        ingest_jobs.forget(namespace)  # the quota only resets once the data is really gone
+        return True
+
+    NamespaceSweeper(
+        namespace_registry,
+        delete_fn=sweep_delete,
+        is_busy=lambda namespace: any(not job.finished for job in ingest_jobs.jobs(namespace)),
+    ).start()
+    return warm_up()
+
+load_resources()
+
 # 1. Session Management
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
-    st.session_state.files_processed = False
+    st.session_state.submitted_files = set()
     st.session_state.start_time = datetime.now()
+    # Registered up front so chat-only sessions are swept too (their thread goes with the namespace)
+    namespace_registry.register(st.session_state.session_id, ephemeral=True)
 
 session_id = st.session_state.session_id
 
@@ -173,35 +199,70 @@ with st.sidebar:
     st.header("Upload Material")
     st.caption(f"Session ID: {session_id[:8]}...")
     
-    uploaded_file = st.file_uploader("Upload a PDF", type="pdf")
+    uploaded_files = st.file_uploader("Upload PDFs", type="pdf", accept_multiple_files=True)
+    new_files = [
+        f for f in uploaded_files or []
+        if (f.name, f.size) not in st.session_state.submitted_files
+    ]
     
-    if uploaded_file and not st.session_state.files_processed:
-        if st.button("Process PDF"):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
-            
-            with st.spinner("Indexing document..."):
+    if new_files:
+        if st.button(f"Process {len(new_files)} PDF(s)"):
+            for uploaded_file in new_files:
                 try:
-                    ingest_pdf(tmp_path, namespace=session_id)
-                    st.session_state.files_processed = True
-                    st.success("Indexed!")
-                    st.warning(
-                        "IMPORTANT: When you are done, please click 'End Session' below. "
-                        "This frees up the database for your next use!"
-                    )
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                finally:
-                    os.remove(tmp_path)
+                    # Check the limit before writing anything to disk
+                    ingest_jobs.check_bytes(session_id, uploaded_file.size)
+                    tmp_path = spool_upload(uploaded_file)
+                    # Session namespaces are garbage-collected once idle (see NamespaceSweeper)
+                    namespace_registry.register(session_id, ephemeral=True)
+                    # Files are indexed in parallel in the background; the spooled copy is removed when the job ends
+                    ingest_jobs.submit(tmp_path, namespace=session_id, source=uploaded_file.name, cleanup=True)
+                    st.session_state.submitted_files.add((uploaded_file.name, uploaded_file.size))
+                except QuotaExceeded as e:
+                    st.error(str(e))
+                    break
+            st.warning(
+                "IMPORTANT: When you are done, please click 'End Session' below. "
+                "This frees up the database for your next use!"
+            )
+    
+    # Polls job progress every second without rerunning the whole page
+    @st.fragment(run_every="1s")
+    def show_ingest_jobs():
+        jobs = ingest_jobs.jobs(session_id)
+        if jobs:
+            usage = ingest_jobs.usage(session_id)
+            st.caption(
+                f"Used {usage['bytes'] / 2**20:.1f}/{ingest_jobs.max_bytes / 2**20:.0f} MB, "
+                f"{usage['chunks']}/{ingest_jobs.max_chunks} chunks"
+            )
+        for job in jobs:
+            status = job.snapshot()
+            if status["status"] in ("queued", "running"):
+                pages = f"{status['pages_done']}/{status['pages_total'] or '?'} pages"
+                st.progress(
+                    min(1.0, status["pages_done"] / status["pages_total"]) if status["pages_total"] else 0.0,
+                    text=f"{status['source']}: {pages}, {status['chunks_done']} chunks searchable",
+                )
+                if st.button("Cancel", key=f"cancel-{status['id']}"):
+                    ingest_jobs.cancel(status["id"])
+            elif status["status"] == "done":
+                st.success(f"Indexed {status['source']}!")
+            elif status["status"] == "cancelled":
+                st.info(f"Cancelled {status['source']} ({status['chunks_done']} chunks kept)")
+            else:
+                st.error(f"Error indexing {status['source']}: {status['error']}")
+    
+    show_ingest_jobs()
     
     st.divider()
     
     # 3. END SESSION BUTTON
     if st.button("End Session & Clear Data"):
         with st.spinner("Cleaning up your data from the cloud..."):
-            # A. Delete vectors from Pinecone
-            delete_namespace(session_id)
+            # A. Stop any uploads still running, then delete vectors from Pinecone
+            ingest_jobs.cancel_namespace(session_id)
+            if delete_namespace(session_id):
+                ingest_jobs.forget(session_id)
             
             # B. Clear Streamlit History
             for key in list(st.session_state.keys()):
@@ -230,15 +291,34 @@ if prompt := st.chat_input("Ask a question about your notes..."):
         
         # Retry logic for the Brain is handled inside graph.py, but we catch UI errors here
         try:
-            inputs = {
-                "messages": [HumanMessage(content=prompt)],
-                "namespace": session_id
-            }
-            result = graph_app.invoke(inputs)
+            # Only the new question is sent; earlier turns come from the session's checkpoint
+            inputs = turn_input(prompt, session_id)
+            # Stream tokens into the placeholder as they are generated
+            start = time.perf_counter()
+            first_token_at = None
+            streamed = ""
+            result = None
+            for mode, payload in graph_app.stream(
+                inputs, config=thread_config(session_id), stream_mode=["custom", "values"]
+            ):
+                if mode == "values":
+                    result = payload
+                elif payload.get("reset"):
+                    # The document had no answer after all; the web answer follows
+                    streamed = ""
+                    message_placeholder.empty()
+                elif "token" in payload:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        print(f"Time to first token: {(first_token_at - start) * 1000:.0f}ms")
+                    streamed += payload["token"]
+                    message_placeholder.markdown(streamed + "▌")
             bot_response = result["messages"][-1].content
             
             message_placeholder.markdown(bot_response)
             st.session_state.messages.append({"role": "assistant", "content": bot_response})
+            # Fold old messages into the summary now that the answer is on screen
+            compact_later(session_id)
             
         except Exception as e:
             st.error(f"An error occurred: {e}")
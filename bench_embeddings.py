@@ -0,0 +1,85 @@
+import argparse
+import json
+import random
+import time
+import numpy as np
+from ingest import find_pdfs
+from src.chunking import iter_chunks
+from src.manifest import hash_file
+from src.rag import create_embedding_model
+
+# Compares embedding backends on the same chunks: throughput, and whether
+# the candidate finds the same neighbours as the reference model.
+
+def load_texts(folder: str, limit: int):
+    texts = []
+    for path in find_pdfs(folder):
+        texts.extend(doc.page_content for _, doc in iter_chunks(path, hash_file(path)))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+def embed_timed(model, texts):
+    start = time.perf_counter()
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12), elapsed
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray, queries_ref, queries_cand, k: int) -> float:
+    """Mean overlap of the top-k neighbours each model returns for the same queries."""
+    top_ref = np.argsort(-(queries_ref @ reference.T), axis=1)[:, :k]
+    top_cand = np.argsort(-(queries_cand @ candidate.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_cand)]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark an embedding backend against the reference model.")
+    parser.add_argument("--data", default="data", help="Folder of PDFs to take chunks from.")
+    parser.add_argument("--limit", type=int, default=1000, help="Max chunks to embed.")
+    parser.add_argument("--queries", type=int, default=100, help="Chunks reused as queries (their first sentence).")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared for recall@k.")
+    parser.add_argument("--reference", default="huggingface")
+    parser.add_argument("--candidate", default="onnx")
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    texts = load_texts(args.data, args.limit)
+    if not texts:
+        print(f"No PDFs with text found in '{args.data}'.")
+        return
+    random.seed(0)
+    queries = [t.split(". ")[0][:200] for t in random.sample(texts, min(args.queries, len(texts)))]
+
+    results = {"chunks": len(texts), "queries": len(queries), "k": args.k}
+    vectors = {}
+    for role, backend in (("reference", args.reference), ("candidate", args.candidate)):
+        start = time.perf_counter()
+        model, name = create_embedding_model(backend)
+        load_seconds = time.perf_counter() - start
+        model.embed_documents(texts[:8])  # first-call setup isn't part of the throughput
+        docs, elapsed = embed_timed(model, texts)
+        query_vectors, _ = embed_timed(model, queries)
+        vectors[role] = (docs, query_vectors)
+        results[role] = {
+            "backend": name,
+            "load_seconds": load_seconds,
+            "dimension": docs.shape[1],
+            "chunks_per_second": len(texts) / elapsed,
+        }
+        print(f"{role:<9} {name}: {docs.shape[1]} dims, {len(texts) / elapsed:.1f} chunks/sec (loaded in {load_seconds:.1f}s)")
+
+    (ref_docs, ref_queries), (cand_docs, cand_queries) = vectors["reference"], vectors["candidate"]
+    if ref_docs.shape[1] != cand_docs.shape[1]:
+        print("Dimensions differ: the candidate can't share the existing index.")
+        return
+    results["mean_cosine"] = float(np.mean(np.sum(ref_docs * cand_docs, axis=1)))
+    results["recall_at_k"] = recall_at_k(ref_docs, cand_docs, ref_queries, cand_queries, args.k)
+    results["speedup"] = results["candidate"]["chunks_per_second"] / results["reference"]["chunks_per_second"]
+    print(f"Speedup: {results['speedup']:.2f}x")
+    print(f"Parity: mean cosine {results['mean_cosine']:.4f}, recall@{args.k} {results['recall_at_k']:.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Offline, reproducible performance run of the whole app: ingest_pdf,
+# get_retriever and the compiled graph, against local stand-ins for Pinecone
+# (the local vector backend in a temp dir), Gemini and DuckDuckGo.
+# src.* is imported only after the environment below is set up.
+
+# --- Stand-ins -------------------------------------------------------------
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings (hashed into `size` dims), so retrieval scores mean something."""
+
+    def __init__(self, size: int = 384):
+        self.size = size
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        return (vector / (np.linalg.norm(vector) + 1e-12)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model with a fixed time to first token and per-token
+    delay. A `no_answer_rate` share of document prompts (picked by hash) is
+    answered with NO_ANSWER, split across two tokens, to exercise the
+    fallback to web search.
+    """
+
+    first_token_ms: float = 300.0
+    token_ms: float = 5.0
+    answer_tokens: int = 60
+    no_answer_rate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-bench"
+
+    def _tokens(self, messages) -> List[str]:
+        seed = hashlib.md5("".join(str(m.content) for m in messages).encode()).hexdigest()
+        if "NO_ANSWER" in str(messages[0].content) and int(seed[:8], 16) / 16 ** 8 < self.no_answer_rate:
+            return ["NO_", "ANSWER"]
+        return [f"{seed[i % len(seed)]}{i} " for i in range(self.answer_tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep((self.first_token_ms + self.token_ms * len(tokens)) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_ms / 1000)
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            time.sleep(self.token_ms / 1000)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            await asyncio.sleep(self.token_ms / 1000)
+
+class FakeSearch:
+    """Stands in for DuckDuckGoSearchRun: fixed latency, deterministic results."""
+
+    def __init__(self, latency_ms: float = 500.0):
+        self.latency_ms = latency_ms
+
+    def _results(self, query: str) -> str:
+        return f"Search results for {query!r}: " + " ".join(f"result{i}" for i in range(50))
+
+    def invoke(self, query: str) -> str:
+        time.sleep(self.latency_ms / 1000)
+        return self._results(query)
+
+    async def ainvoke(self, query: str) -> str:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._results(query)
+
+# --- Corpus ----------------------------------------------------------------
+
+def write_pdf(path: str, pages: List[str]):
+    """Writes a minimal text-only PDF (Helvetica, one content stream per page)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        lines = [text[j:j + 90] for j in range(0, len(text), 90)]
+        stream = "BT /F1 9 Tf 36 806 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out, offsets = "%PDF-1.4\n", []
+    for n, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{n} 0 obj\n{obj}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{o:010d} 00000 n \n" for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    with open(path, "w", encoding="latin-1") as f:
+        f.write(out)
+
+def make_corpus(folder: str, docs: int, pages: int, words_per_page: int, rng: random.Random):
+    """
+    Generates PDFs where every page is mostly about its own small set of
+    topic words. Returns (pdf paths, topic words of every page).
+    """
+    vocabulary = [f"term{i}" for i in range(5000)]
+    paths, topics = [], []
+    for d in range(docs):
+        content = []
+        for p in range(pages):
+            topic = rng.sample(vocabulary, 30)
+            words = [rng.choice(topic) if rng.random() < 0.8 else rng.choice(vocabulary) for _ in range(words_per_page)]
+            content.append(" ".join(words))
+            topics.append(topic)
+        path = os.path.join(folder, f"doc{d:03d}.pdf")
+        write_pdf(path, content)
+        paths.append(path)
+    return paths, topics
+
+def make_questions(n: int, topics: List[List[str]], rng: random.Random, off_topic: float):
+    """Questions about a random page's topic, plus a share with no match in the corpus."""
+    questions = []
+    for i in range(n):
+        if rng.random() < off_topic:
+            questions.append(" ".join(f"unrelated{rng.randrange(10**6)}" for _ in range(8)))
+        else:
+            questions.append(" ".join(rng.sample(rng.choice(topics), 8)))
+    return questions
+
+# --- Measurement -----------------------------------------------------------
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+def summarize(samples_ms: List[float]) -> dict:
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(values.size),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage: str, ms: float):
+        self.samples.setdefault(stage, []).append(ms)
+
+    def add_metrics(self, prefix: str, metrics: dict):
+        """Per-node timings the graph already reports in state["metrics"]."""
+        for key, value in metrics.items():
+            if key.endswith("_ms") and isinstance(value, (int, float)):
+                self.add(f"{prefix}.{key[:-3]}", value)
+
+    def stages(self) -> dict:
+        return {stage: summarize(values) for stage, values in sorted(self.samples.items())}
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+def configure_environment(workdir: str, args):
+    """Points every on-disk store at `workdir` and selects the local backends. Must run before importing src."""
+    os.environ.update({
+        "VECTOR_BACKEND": "local",
+        "LOCAL_VECTOR_DIR": os.path.join(workdir, "vectors"),
+        "MANIFEST_PATH": os.path.join(workdir, "manifest.sqlite3"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical.sqlite3"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "NAMESPACE_REGISTRY_PATH": os.path.join(workdir, "namespaces.sqlite3"),
+        "DOCSTORE_PATH": os.path.join(workdir, "docstore.sqlite3"),
+        "UPLOAD_SPOOL_DIR": os.path.join(workdir, "uploads"),
+        "CHECKPOINT_BACKEND": "memory",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "offline"),
+    })
+    if not args.answer_cache:
+        os.environ["ANSWER_CACHE_ENABLED"] = "false"
+
+def run(args, workdir: str) -> dict:
+    configure_environment(workdir, args)
+    from src import graph, rag
+    from src.conversation import thread_config
+    from src.config import (
+        EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_MODEL_NAME, EMBED_BATCHING, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS,
+    )
+    from src.embedding_cache import CachedEmbeddings
+    from src.embedding_batcher import EmbeddingBatcher
+    from src.llm_client import llm_client
+    from src.answer_cache import answer_cache
+    from src import telemetry
+
+    if not args.real_embeddings:
+        model = HashingEmbeddings()
+        if EMBED_BATCHING:
+            model = EmbeddingBatcher(model, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS)
+        rag.embedding_function = CachedEmbeddings(
+            model, model_name="bench-hashing",
+            path=os.environ["EMBEDDING_CACHE_PATH"], max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        )
+    graph.llm = FakeChatModel(
+        first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms, no_answer_rate=args.no_answer_rate,
+    )
+    graph.search_tool = FakeSearch(latency_ms=args.search_ms)
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {**vars(args), "embedding_model": EMBEDDING_MODEL_NAME if args.real_embeddings else "bench-hashing"},
+        "throughput": {},
+        "peak_rss_mb": {},
+    }
+    namespace = "bench"
+
+    # 1. Ingest a generated corpus
+    corpus_dir = os.path.join(workdir, "corpus")
+    os.makedirs(corpus_dir)
+    paths, topics = make_corpus(corpus_dir, args.docs, args.pages, args.words_per_page, rng)
+    chunks = []
+
+    def count_chunks(uploaded):
+        for chunk_ids in uploaded.values():
+            chunks.extend(chunk_ids)
+
+    start = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        rag.ingest_pdf(path, namespace, on_batch=count_chunks)
+        recorder.add("ingest.file", (time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    results["throughput"]["ingest_docs_per_s"] = len(paths) / elapsed
+    results["throughput"]["ingest_chunks_per_s"] = len(chunks) / elapsed
+    results["throughput"]["chunks"] = len(chunks)
+    results["peak_rss_mb"]["after_ingest"] = peak_rss_mb()
+
+    # 2. Retrieval alone (two-stage retriever, no graph)
+    retriever = rag.get_retriever(namespace)
+    for question in make_questions(args.queries, topics, rng, off_topic=0.0):
+        t0 = time.perf_counter()
+        _, stats = retriever.retrieve(question)
+        recorder.add("retrieve.total", (time.perf_counter() - t0) * 1000)
+        recorder.add_metrics("retrieve", stats)
+    results["peak_rss_mb"]["after_retrieval"] = peak_rss_mb()
+
+    # 3. Graph, one question at a time (each its own conversation, so no follow-up rewriting)
+    routes = {}
+    for i, question in enumerate(make_questions(args.queries, topics, rng, args.off_topic)):
+        t0 = time.perf_counter()
+        state = graph.app.invoke(graph.turn_input(question, namespace), config=thread_config(f"seq-{i}"))
+        recorder.add("graph.total", (time.perf_counter() - t0) * 1000)
+        recorder.add_metrics("graph", state.get("metrics", {}))
+        route = state.get("route", "cache")
+        routes[route] = routes.get(route, 0) + 1
+    results["routes"] = routes
+    results["peak_rss_mb"]["after_graph"] = peak_rss_mb()
+
+    # 4. Graph under concurrency (ainvoke)
+    async def concurrent():
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def one(i, question):
+            async with slots:
+                t0 = time.perf_counter()
+                await graph.app.ainvoke(graph.turn_input(question, namespace), config=thread_config(f"async-{i}"))
+                recorder.add("graph_concurrent.total", (time.perf_counter() - t0) * 1000)
+
+        questions = make_questions(args.queries, topics, rng, args.off_topic)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, q) for i, q in enumerate(questions)))
+        return len(questions) / (time.perf_counter() - t0)
+
+    results["throughput"]["graph_concurrent_qps"] = asyncio.run(concurrent())
+    results["peak_rss_mb"]["after_concurrent"] = peak_rss_mb()
+
+    results["stages"] = recorder.stages()
+    results["llm"] = llm_client.stats()
+    results["doc_fallbacks"] = telemetry.doc_fallbacks_total.value()  # both graph phases
+    results["retriever_cache"] = rag.get_retriever_stats()
+    results["embedding_cache"] = rag.get_embedding_cache_stats()
+    results["answer_cache"] = answer_cache.stats()
+    batcher = rag.get_embedding_function().embeddings
+    if isinstance(batcher, EmbeddingBatcher):
+        results["embed_batching"] = batcher.stats()
+    return results
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"\n--- Pipeline benchmark ({results['commit'] or 'no git'}) ---")
+    base_stages = (baseline or {}).get("stages", {})
+    for stage, s in results["stages"].items():
+        line = f"{stage:<32} p50 {s['p50_ms']:9.1f}ms  p95 {s['p95_ms']:9.1f}ms  (n={s['n']})"
+        if stage in base_stages:
+            b = base_stages[stage]
+            line += f"  vs baseline p50 {s['p50_ms'] - b['p50_ms']:+.1f}ms p95 {s['p95_ms'] - b['p95_ms']:+.1f}ms"
+        print(line)
+    for name, value in results["throughput"].items():
+        print(f"{name:<32} {value:.2f}")
+    print(f"{'routes':<32} {results['routes']}")
+    if "doc_fallbacks" in results:
+        print(f"{'doc answers fell back to web':<32} {results['doc_fallbacks']:.0f}")
+    if "embed_batching" in results:
+        b = results["embed_batching"]
+        print(f"{'query embedding batches':<32} {b['batches']} for {b['queries']} queries "
+              f"(mean size {b['mean_batch_size']:.1f}, mean queue {b['mean_queue_ms']:.1f}ms)")
+    if "llm" in results:
+        llm = results["llm"]
+        print(f"{'llm calls':<32} {llm['calls']} ({llm['retries']} retries, {llm['hedges']} hedges, "
+              f"{llm['hedge_wins']} hedge wins, breaker {llm['breaker']})")
+    if "retriever_cache" in results:
+        r, e, a = results["retriever_cache"], results["embedding_cache"], results["answer_cache"]
+        print(f"{'retriever cache':<32} {r['hits']} hits, {r['misses']} misses, {r['saved_seconds']:.2f}s saved")
+        print(f"{'embedding cache':<32} {e['hits']} hits, {e['misses']} misses ({e['hit_rate']:.0%})")
+        print(f"{'answer cache':<32} {a['hits']} hits of {a['lookups']} lookups, {a['saved_ms']:.0f}ms saved")
+    print(f"{'peak RSS':<32} {max(results['peak_rss_mb'].values()):.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of ingest, retrieval and the graph with local fakes.")
+    parser.add_argument("--docs", type=int, default=20, help="Generated PDFs.")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per PDF.")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=50, help="Questions per phase.")
+    parser.add_argument("--off-topic", type=float, default=0.2, help="Share of questions with no match in the corpus.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent graph runs in the last phase.")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=5.0)
+    parser.add_argument("--search-ms", type=float, default=500.0)
+    parser.add_argument("--no-answer-rate", type=float, default=0.1,
+                        help="Share of document answers the fake LLM gives as NO_ANSWER (web fallback).")
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding model instead of hashing.")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_pipeline.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="chatdoc-bench-") as workdir:
+        results = run(args, workdir)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Each measurement runs in a fresh interpreter, so nothing is already imported or cached
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+result = {{"import_seconds": time.perf_counter() - start}}
+if {warm}:
+    from src.graph import warm_up
+    start = time.perf_counter()
+    result["warm_up"] = warm_up()
+    result["warm_up_seconds"] = time.perf_counter() - start
+result["heavy_modules_loaded"] = sorted(m for m in {heavy!r} if m in sys.modules)
+print("RESULT " + json.dumps(result))
+"""
+
+# Imports that used to happen as a side effect of importing the app's modules
+HEAVY_MODULES = [
+    "sentence_transformers", "torch", "langchain_huggingface",
+    "langchain_google_genai", "langchain_pinecone", "pinecone", "duckduckgo_search", "ddgs",
+]
+
+def measure(module: str, warm: bool, runs: int):
+    samples = []
+    for _ in range(runs):
+        code = PROBE.format(module=module, warm=warm, heavy=HEAVY_MODULES)
+        # From the repo root, so `import src...` works wherever the script is started
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        lines = [l for l in out.stdout.splitlines() if l.startswith("RESULT ")]
+        if out.returncode != 0 or not lines:
+            raise RuntimeError(f"Probe for {module} failed:\n{out.stderr[-2000:]}")
+        samples.append(json.loads(lines[-1][len("RESULT "):]))
+    imports = [s["import_seconds"] for s in samples]
+    summary = {
+        "module": module,
+        "runs": runs,
+        "import_median_s": statistics.median(imports),
+        "import_min_s": min(imports),
+        "heavy_modules_loaded": samples[-1]["heavy_modules_loaded"],
+    }
+    if warm:
+        summary["warm_up_median_s"] = statistics.median(s["warm_up_seconds"] for s in samples)
+        summary["warm_up_last"] = samples[-1]["warm_up"]
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import and warm-up time of the app's modules.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module.")
+    parser.add_argument("--warm", action="store_true", help="Also time warm_up() (loads the model, needs API keys).")
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = [measure(m, False, args.runs) for m in ("src.rag", "src.graph")]
+    if args.warm:
+        results.append(measure("src.graph", True, args.runs))
+
+    for r in results:
+        line = f"{r['module']:<10} import {r['import_median_s'] * 1000:7.0f}ms (min {r['import_min_s'] * 1000:.0f}ms)"
+        if "warm_up_median_s" in r:
+            line += f" | warm-up {r['warm_up_median_s']:.2f}s"
+        print(line)
+        print(f"           heavy modules loaded: {', '.join(r['heavy_modules_loaded']) or 'none'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import os
+from src.config import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR
+
+# Needs torch and transformers (installed with sentence-transformers) and onnxruntime.
+# Writes model.onnx, model_quantized.onnx and tokenizer.json for EMBEDDING_BACKEND=onnx.
+
+def export(model_name: str, out_dir: str, quantize: bool = True, opset: int = 17):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+
+    # 1. Export the transformer; pooling and normalization run in NumPy (src/onnx_embeddings.py)
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {"batch": 0, "sequence": 1}
+    model_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in names),
+            model_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{n: dynamic for n in names}, "last_hidden_state": dynamic},
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(out_dir)
+    print(f"Exported {repo} to {model_path}")
+
+    # 2. Dynamic int8 quantization of the weights
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(out_dir, "model_quantized.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized to {quantized_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (and int8).")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="sentence-transformers model name.")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR, help="Output directory (ONNX_MODEL_DIR).")
+    parser.add_argument("--no-quantize", action="store_true", help="Only write the float32 model.")
+    args = parser.parse_args()
+    export(args.model, args.out, quantize=not args.no_quantize)
+
+if __name__ == "__main__":
+    main()
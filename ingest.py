@@ -1,37 +1,150 @@
+import argparse
 import os
-from src.rag import ingest_pdf
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from src.config import MANIFEST_PATH
+from src.manifest import Manifest, hash_file
+from src.chunking import iter_chunks
+
+# NOTE: src.rag is imported inside bulk_ingest() so the worker processes only load
+# the parsing code, not the embedding model or the Pinecone client.
 
 # Define where your PDFs are
 DATA_FOLDER = "data"
 
+_worker_manifest = None
+
+def chunk_file(file_path: str, namespace: str):
+    """
+    Worker process: hashes and chunks one PDF.
+    Returns (file_path, file_hash, chunks); chunks is None when the file is
+    already fully indexed, otherwise only the chunks not yet uploaded.
+    """
+    global _worker_manifest
+    if _worker_manifest is None:
+        _worker_manifest = Manifest(MANIFEST_PATH)
+
+    file_hash = hash_file(file_path)
+    if _worker_manifest.is_complete(namespace, file_hash):
+        return file_path, file_hash, None
+    done = _worker_manifest.chunk_ids(namespace, file_hash)
+    chunks = [c for c in iter_chunks(file_path, file_hash) if c[0] not in done]
+    return file_path, file_hash, chunks
+
+def _parsed_files(pool, paths, namespace: str, window: int):
+    """Submits files to the pool with at most `window` in flight, yielding futures as they finish."""
+    remaining = iter(paths)
+    futures = {pool.submit(chunk_file, p, namespace) for p in islice(remaining, window)}
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            next_path = next(remaining, None)
+            if next_path is not None:
+                futures.add(pool.submit(chunk_file, next_path, namespace))
+            yield future
+
+def find_pdfs(folder: str):
+    pdfs = []
+    for root, _, names in os.walk(folder):
+        for name in names:
+            if name.lower().endswith(".pdf"):
+                pdfs.append(os.path.join(root, name))
+    return sorted(pdfs)
+
+def bulk_ingest(paths, namespace: str, workers: int, data_folder: str = DATA_FOLDER):
+    """
+    Parses and chunks PDFs in a process pool while this process embeds
+    chunks from all files in shared batches and uploads them.
+    Progress is checkpointed per chunk in the manifest, so re-running after a
+    crash skips finished files and only uploads the missing chunks.
+    """
+    from src.rag import begin_ingest, finish_ingest, upload_chunks
+
+    counts = {"indexed": 0, "skipped": 0, "failed": 0, "stale": 0}
+    pending = {}  # file_hash -> [chunks left, [(source, previous_hash), ...]]
+    lock = threading.Lock()
+
+    def finish(file_hash):
+        for source, previous_hash in pending.pop(file_hash)[1]:
+            counts["stale"] += finish_ingest(namespace, source, file_hash, previous_hash)
+            counts["indexed"] += 1
+            print(f"Finished: {source}")
+
+    def on_batch(uploaded):
+        with lock:
+            for file_hash, chunk_ids in uploaded.items():
+                pending[file_hash][0] -= len(chunk_ids)
+                if pending[file_hash][0] <= 0:
+                    finish(file_hash)
+
+    def all_chunks(pool):
+        for future in _parsed_files(pool, paths, namespace, window=workers * 2):
+            try:
+                file_path, file_hash, chunks = future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Error processing file: {e}")
+                continue
+
+            source = os.path.relpath(file_path, data_folder)
+            with lock:
+                plan = begin_ingest(file_path, namespace, source, file_hash)
+                if plan is None or chunks is None:
+                    counts["skipped"] += 1
+                    continue
+                if file_hash in pending:
+                    # Same content under another name is already in flight
+                    pending[file_hash][1].append((source, plan[1]))
+                    continue
+                pending[file_hash] = [len(chunks), [(source, plan[1])]]
+                if not chunks:
+                    finish(file_hash)
+                    continue
+            print(f"Processing: {source} ({len(chunks)} chunks)")
+            yield from chunks
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        stats = upload_chunks(all_chunks(pool), namespace, on_batch=on_batch)
+    elapsed = time.perf_counter() - start
+
+    docs = counts["indexed"] + counts["skipped"]
+    print("\n--- Bulk ingest summary ---")
+    print(f"Files: {counts['indexed']} indexed, {counts['skipped']} already up to date, {counts['failed']} failed")
+    print(f"Chunks uploaded: {stats['chunks']} ({counts['stale']} stale removed)")
+    print(f"Elapsed: {elapsed:.1f}s | {docs / elapsed:.2f} docs/sec | {stats['chunks'] / elapsed:.1f} chunks/sec")
+    if stats["embed_seconds"]:
+        print(f"Embedding: {stats['chunks'] / stats['embed_seconds']:.1f} chunks/sec over {stats['embed_seconds']:.1f}s")
+    return counts
+
 def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a folder of PDFs into Pinecone.")
+    parser.add_argument("--data", default=DATA_FOLDER, help="Folder to scan for PDFs (recursively).")
+    parser.add_argument("--namespace", default="", help="Target namespace (default: the index's default namespace).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parsing processes.")
+    args = parser.parse_args()
+
     # 1. Check if folder exists
-    if not os.path.exists(DATA_FOLDER):
-        os.makedirs(DATA_FOLDER)
-        print(f"Created '{DATA_FOLDER}' folder. Please put your PDFs inside it and run this script again.")
+    if not os.path.exists(args.data):
+        os.makedirs(args.data)
+        print(f"Created '{args.data}' folder. Please put your PDFs inside it and run this script again.")
         return
 
     # 2. Find all PDF files
-    print(f"Scanning '{DATA_FOLDER}' for documents...")
-    files = [f for f in os.listdir(DATA_FOLDER) if f.lower().endswith(".pdf")]
+    print(f"Scanning '{args.data}' for documents...")
+    files = find_pdfs(args.data)
 
     if not files:
         print("No PDFs found! Please drop your exam papers in the 'data/' folder.")
         return
 
-    # 3. Loop through and upload each one
-    print(f"found {len(files)} files. Starting upload process...")
-    
-    for pdf_file in files:
-        file_path = os.path.join(DATA_FOLDER, pdf_file)
-        try:
-            print(f"Processing: {pdf_file}")
-            ingest_pdf(file_path)
-            print(f"Finished: {pdf_file}")
-        except Exception as e:
-            print(f"Error uploading {pdf_file}: {e}")
-            
+    # 3. Parse in parallel, embed and upload in shared batches
+    print(f"found {len(files)} files. Starting upload process with {args.workers} workers...")
+    bulk_ingest(files, namespace=args.namespace, workers=args.workers, data_folder=args.data)
+
     print("\nAll documents processed! You can now chat with your bot.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from langchain_core.embeddings import Embeddings
+from bench_pipeline import (
+    FakeChatModel, FakeSearch, HashingEmbeddings, Recorder, configure_environment, git_commit,
+    make_corpus, make_questions, peak_rss_mb,
+)
+
+# Simulates N concurrent chat sessions doing what app.py does: upload PDFs
+# into the session's namespace, ask a scripted series of questions, then
+# End Session. Each concurrency level reports throughput, per-phase latency
+# percentiles, error rate and memory per session, so you can see where
+# latency collapses. Runs against local stand-ins by default (see
+# bench_pipeline.py) or, with --real, the backends configured in .env.
+
+FOLLOW_UPS = ["Can you explain that in more detail?", "What does the document say about the second point?"]
+
+class DelayedEmbeddings(Embeddings):
+    """Adds model-like cost to the stand-in: one forward pass at a time, fixed + per-text time."""
+
+    def __init__(self, embeddings: Embeddings, call_ms: float, text_ms: float):
+        self.embeddings = embeddings
+        self.call_ms = call_ms
+        self.text_ms = text_ms
+        self._lock = threading.Lock()  # a CPU-bound model doesn't run two batches faster than one
+
+    def _cost(self, n: int):
+        with self._lock:
+            time.sleep((self.call_ms + self.text_ms * n) / 1000)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._cost(len(texts))
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._cost(1)
+        return self.embeddings.embed_query(text)
+
+def current_rss_mb() -> float:
+    """Resident memory now (Linux); falls back to the peak elsewhere."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+class MemorySampler:
+    """Samples RSS in the background to catch the high-water mark of a level."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.max_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.max_mb = max(self.max_mb, current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def setup_stand_ins(args):
+    from src import graph, rag
+    from src.config import EMBEDDING_CACHE_MAX_ENTRIES, EMBED_BATCHING, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS
+    from src.embedding_cache import CachedEmbeddings
+    from src.embedding_batcher import EmbeddingBatcher
+
+    model = DelayedEmbeddings(HashingEmbeddings(), args.embed_call_ms, args.embed_text_ms)
+    if EMBED_BATCHING:
+        model = EmbeddingBatcher(model, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS)
+    rag.embedding_function = CachedEmbeddings(
+        model, model_name="load-hashing",
+        path=os.environ["EMBEDDING_CACHE_PATH"], max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+    graph.llm = FakeChatModel(
+        first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms, no_answer_rate=args.no_answer_rate,
+    )
+    graph.search_tool = FakeSearch(latency_ms=args.search_ms)
+
+def run_session(name: str, args, workdir: str, recorder: Recorder, errors: dict, lock: threading.Lock):
+    """One user: upload -> ingest -> questions -> End Session. Mirrors the calls app.py makes."""
+    from src.graph import app as graph_app, turn_input, compact_later
+    from src.conversation import thread_config
+    from src.jobs import ingest_jobs, spool_upload
+    from src.rag import delete_namespace, namespace_registry
+
+    def record(phase: str, start: float):
+        with lock:
+            recorder.add(phase, (time.perf_counter() - start) * 1000)
+
+    def failed(phase: str, e: Exception):
+        with lock:
+            errors[phase] = errors.get(phase, 0) + 1
+        print(f"[{name}] {phase} failed: {e}")
+
+    rng = random.Random(f"{args.seed}-{name}")
+    session_start = time.perf_counter()
+    folder = os.path.join(workdir, name)
+    os.makedirs(folder)
+    paths, topics = make_corpus(folder, args.docs_per_session, args.pages, args.words_per_page, rng)
+
+    # 1. Upload and ingest (spooled to disk, indexed by the shared background job queue)
+    start = time.perf_counter()
+    try:
+        namespace_registry.register(name, ephemeral=True)
+        jobs = []
+        for path in paths:
+            with open(path, "rb") as f:
+                data = io.BytesIO(f.read())
+            ingest_jobs.check_bytes(name, len(data.getvalue()))
+            jobs.append(ingest_jobs.submit(spool_upload(data), namespace=name, source=os.path.basename(path), cleanup=True))
+        for job in jobs:
+            job.wait()
+            if job.status != "done":
+                raise RuntimeError(job.error or job.status)
+        record("ingest", start)
+    except Exception as e:
+        failed("ingest", e)
+
+    # 2. Scripted questions, streamed like the chat UI
+    questions = make_questions(args.questions, topics, rng, args.off_topic)
+    for i, question in enumerate(questions):
+        if i and rng.random() < args.follow_ups:
+            question = rng.choice(FOLLOW_UPS)
+        time.sleep(args.think_ms / 1000)
+        start = time.perf_counter()
+        first_token = None
+        try:
+            result = None
+            for mode, payload in graph_app.stream(
+                turn_input(question, name), config=thread_config(name), stream_mode=["custom", "values"]
+            ):
+                if mode == "values":
+                    result = payload
+                elif "token" in payload and first_token is None:
+                    first_token = time.perf_counter()
+            if result["metrics"].get("answer_source") == "error":
+                raise RuntimeError(result["messages"][-1].content)
+            record("question", start)
+            compact_later(name)
+            if first_token is not None:
+                with lock:
+                    recorder.add("first_token", (first_token - start) * 1000)
+                    recorder.add_metrics("graph", result.get("metrics", {}))
+        except Exception as e:
+            failed("question", e)
+
+    # 3. End Session
+    start = time.perf_counter()
+    try:
+        ingest_jobs.cancel_namespace(name)
+        if not delete_namespace(name):
+            raise RuntimeError("delete_namespace returned False")
+        ingest_jobs.forget(name)
+        record("delete", start)
+    except Exception as e:
+        failed("delete", e)
+    record("session", session_start)
+
+def run_level(level: int, args, workdir: str) -> dict:
+    recorder = Recorder()
+    errors = {}
+    lock = threading.Lock()
+    names = [f"load-{level}-{i}" for i in range(level * args.rounds)]
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    with MemorySampler() as memory, ThreadPoolExecutor(max_workers=level, thread_name_prefix="session") as pool:
+        futures = [pool.submit(run_session, name, args, workdir, recorder, errors, lock) for name in names]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    stages = recorder.stages()
+    questions = len(names) * args.questions
+    failures = sum(errors.values())
+    return {
+        "sessions": level,
+        "total_sessions": len(names),
+        "seconds": elapsed,
+        "sessions_per_minute": len(names) / elapsed * 60,
+        "questions_per_second": stages.get("question", {}).get("n", 0) / elapsed,
+        "error_rate": failures / (questions + 2 * len(names)),  # questions + ingest + delete per session
+        "errors": errors,
+        "rss_mb": memory.max_mb,
+        "rss_mb_per_session": max(0.0, memory.max_mb - rss_before) / level,
+        "stages": stages,
+    }
+
+def print_level(result: dict):
+    s = result["stages"]
+
+    def pct(stage: str) -> str:
+        if stage not in s:
+            return f"{'-':>17}"
+        return f"{s[stage]['p50_ms']:7.0f}/{s[stage]['p95_ms']:<7.0f}ms"
+
+    print(
+        f"{result['sessions']:>8} {result['sessions_per_minute']:9.1f} {result['questions_per_second']:7.2f} "
+        f"{pct('ingest')} {pct('first_token')} {pct('question')} {pct('delete')} "
+        f"{result['error_rate'] * 100:6.1f}% {result['rss_mb_per_session']:7.1f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent multi-session load test of the full app flow.")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Concurrent sessions to step through.")
+    parser.add_argument("--rounds", type=int, default=1, help="Sessions each concurrent user runs back to back.")
+    parser.add_argument("--docs-per-session", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--questions", type=int, default=5, help="Questions per session.")
+    parser.add_argument("--follow-ups", type=float, default=0.2, help="Share of questions that are follow-ups.")
+    parser.add_argument("--off-topic", type=float, default=0.2)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause before each question.")
+    parser.add_argument("--max-p95-ms", type=float, default=0.0,
+                        help="Stop stepping once question p95 exceeds this (0 = run every level).")
+    parser.add_argument("--real", action="store_true",
+                        help="Use the configured Pinecone/Gemini/search/embeddings (costs money, mind rate limits).")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=5.0)
+    parser.add_argument("--search-ms", type=float, default=500.0)
+    parser.add_argument("--no-answer-rate", type=float, default=0.1,
+                        help="Share of document answers the fake LLM gives as NO_ANSWER (web fallback).")
+    parser.add_argument("--embed-call-ms", type=float, default=10.0, help="Stand-in model cost per call.")
+    parser.add_argument("--embed-text-ms", type=float, default=1.0, help="Stand-in model cost per text.")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load_test.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="chatdoc-load-") as workdir:
+        if not args.real:
+            configure_environment(workdir, args)
+            setup_stand_ins(args)
+        results = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": vars(args),
+            "levels": [],
+        }
+        # One unrecorded session first, so imports and model loading don't count against the first level
+        run_session("load-warmup", args, workdir, Recorder(), {}, threading.Lock())
+
+        print(f"{'sessions':>8} {'sess/min':>9} {'q/s':>7} {'ingest p50/p95':>17} {'1st token p50/p95':>17} "
+              f"{'question p50/p95':>17} {'delete p50/p95':>17} {'errors':>7} {'MB/sess':>7}")
+        for level in (int(n) for n in args.levels.split(",")):
+            result = run_level(level, args, workdir)
+            results["levels"].append(result)
+            print_level(result)
+            p95 = result["stages"].get("question", {}).get("p95_ms", 0.0)
+            if args.max_p95_ms and p95 > args.max_p95_ms:
+                print(f"Question p95 {p95:.0f}ms is over {args.max_p95_ms:.0f}ms; stopping at {level} sessions.")
+                break
+
+    from src.llm_client import llm_client
+    results["llm"] = llm_client.stats()
+    from src import telemetry
+    results["doc_fallbacks"] = telemetry.doc_fallbacks_total.value()
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
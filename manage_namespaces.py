@@ -0,0 +1,94 @@
+import argparse
+import time
+from datetime import datetime
+from src.config import NAMESPACE_SWEEP_BATCH_SIZE, NAMESPACE_SWEEP_MAX_DELETES_PER_SECOND
+from src.namespaces import NamespaceSweeper
+from src.rag import delete_namespace, list_index_namespaces, namespace_registry
+
+# Inspects and cleans up session namespaces. The app's sweeper does the same
+# in the background; this is for one-off cleanups and index audits.
+
+def _fmt_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+
+def orphans():
+    """Namespaces holding vectors that the registry doesn't know about (e.g. created before it existed)."""
+    known = {row["namespace"] for row in namespace_registry.list()}
+    return [ns for ns in list_index_namespaces() if ns not in known and ns != ""]
+
+def cmd_list(args):
+    rows = namespace_registry.list()
+    print(f"{'namespace':<40} {'kind':<9} {'chunks':>7} {'MB':>8}  last access")
+    for row in rows:
+        kind = "session" if row["ephemeral"] else "kept"
+        print(f"{row['namespace'] or '(default)':<40} {kind:<9} {row['chunks']:>7} "
+              f"{row['bytes'] / 1e6:>8.2f}  {_fmt_time(row['last_access'])}")
+    stray = orphans()
+    if stray:
+        print(f"\n{len(stray)} namespace(s) in the index but not in the registry:")
+        for ns in stray:
+            print(f"  {ns}")
+
+def cmd_prune(args):
+    sweeper = NamespaceSweeper(
+        namespace_registry,
+        delete_fn=delete_namespace,
+        ttl_seconds=args.idle_hours * 3600,
+        batch_size=args.batch_size,
+        max_deletes_per_second=args.rate,
+    )
+    total = 0
+    # 1. Registered session namespaces idle for longer than --idle-hours, a batch at a time
+    while True:
+        batch = sweeper.sweep_once(dry_run=args.dry_run)
+        total += len(batch)
+        for ns in batch:
+            print(f"{'Would delete' if args.dry_run else 'Deleted'}: {ns}")
+        if args.dry_run or len(batch) < args.batch_size:
+            break
+
+    # 2. Namespaces the registry has never seen (no last-access time, so only on request)
+    if args.include_orphans:
+        for ns in orphans():
+            print(f"{'Would delete' if args.dry_run else 'Deleting'} orphan: {ns}")
+            if not args.dry_run and delete_namespace(ns):
+                total += 1
+                if args.rate:
+                    time.sleep(1.0 / args.rate)
+            elif args.dry_run:
+                total += 1
+    print(f"{total} namespace(s) {'would be ' if args.dry_run else ''}deleted.")
+
+def cmd_delete(args):
+    if not delete_namespace(args.namespace):
+        raise SystemExit(1)
+
+def _rate(value: str) -> float:
+    rate = float(value)
+    if rate < 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0 (0 = no limit), got {value}")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description="List and garbage-collect vector namespaces.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="Show registered namespaces and index namespaces missing from the registry.")
+
+    prune = sub.add_parser("prune", help="Delete session namespaces idle for longer than --idle-hours.")
+    prune.add_argument("--idle-hours", type=float, default=24.0)
+    prune.add_argument("--batch-size", type=int, default=NAMESPACE_SWEEP_BATCH_SIZE)
+    prune.add_argument("--rate", type=_rate, default=NAMESPACE_SWEEP_MAX_DELETES_PER_SECOND,
+                       help="Max deletes per second (0 = no limit).")
+    prune.add_argument("--include-orphans", action="store_true",
+                       help="Also delete index namespaces that aren't in the registry.")
+    prune.add_argument("--dry-run", action="store_true", help="Only print what would be deleted.")
+
+    delete = sub.add_parser("delete", help="Delete one namespace.")
+    delete.add_argument("namespace")
+
+    args = parser.parse_args()
+    {"list": cmd_list, "prune": cmd_prune, "delete": cmd_delete}[args.command](args)
+
+if __name__ == "__main__":
+    main()
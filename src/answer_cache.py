@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from src import telemetry
+from src.config import (
+    ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES,
+)
+
+class SemanticAnswerCache:
+    """
+    In-process cache of answers keyed by (namespace, query embedding).
+    A lookup hits when a stored question in the same namespace has cosine
+    similarity >= `threshold` and is younger than `ttl_seconds`. Entries are
+    evicted least-recently-used beyond `max_entries`, and a namespace is
+    dropped whenever its documents change.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # entry_id -> (namespace, unit vector, answer, created_at, cost_ms)
+        self._by_namespace = {}        # namespace -> {entry_id, ...}
+        self._stats = {"lookups": 0, "hits": 0, "saved_ms": 0.0}
+
+    def _drop(self, entry_id):
+        namespace = self._entries.pop(entry_id)[0]
+        ids = self._by_namespace.get(namespace)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_namespace[namespace]
+
+    def lookup(self, namespace: str, vector):
+        """Returns the cached answer text, or None."""
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) + 1e-12)
+        now = time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            expired = [
+                e for e in self._by_namespace.get(namespace, ())
+                if now - self._entries[e][3] > self.ttl_seconds
+            ]
+            for entry_id in expired:
+                self._drop(entry_id)
+            ids = list(self._by_namespace.get(namespace, ()))
+            if not ids:
+                return None
+            matrix = np.stack([self._entries[e][1] for e in ids])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self._stats["hits"] += 1
+            self._stats["saved_ms"] += self._entries[entry_id][4]
+            return self._entries[entry_id][2]
+
+    def store(self, namespace: str, vector, answer: str, cost_ms: float):
+        unit = np.asarray(vector, dtype=np.float32)
+        unit = unit / (np.linalg.norm(unit) + 1e-12)
+        entry_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[entry_id] = (namespace, unit, answer, time.time(), cost_ms)
+            self._by_namespace.setdefault(namespace, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            for entry_id in list(self._by_namespace.get(namespace, ())):
+                self._drop(entry_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+
+# Shared by the graph (lookups/stores) and src/rag.py (invalidation on ingest/delete)
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+)
+
+telemetry.registry.callback(
+    "chatdoc_answer_cache_lookups_total", "Semantic answer cache lookups.",
+    lambda: answer_cache.stats()["lookups"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_answer_cache_hits_total", "Questions answered from the semantic answer cache.",
+    lambda: answer_cache.stats()["hits"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_answer_cache_saved_seconds_total", "Answer latency saved by cache hits.",
+    lambda: answer_cache.stats()["saved_ms"] / 1000, kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_answer_cache_entries", "Answers held in the semantic answer cache.",
+    lambda: answer_cache.stats()["entries"],
+)
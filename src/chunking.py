@@ -0,0 +1,26 @@
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+from src.manifest import make_chunk_id
+
+# Kept free of embedding/vector store imports so worker processes start fast
+
+def iter_chunks(file_path: str, file_hash: str):
+    """
+    Lazily parses the PDF page by page and yields (chunk_id, chunk) as pages
+    arrive, so the whole document is never held in memory at once.
+    """
+    loader = PyPDFLoader(file_path)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+    )
+    for page in loader.lazy_load():
+        for chunk in text_splitter.split_documents([page]):
+            chunk.metadata["file_hash"] = file_hash
+            chunk_id = make_chunk_id(file_hash, chunk.metadata.get("page"), chunk.metadata.get("start_index"))
+            yield chunk_id, chunk
+
+def count_pages(file_path: str) -> int:
+    """Page count from the PDF's page tree, without extracting any text."""
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
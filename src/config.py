@@ -8,3 +8,123 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 HUGGINGFACEHUB_API_TOKEN = os.getenv("HUGGINGFACEHUB_ACCESS_TOKEN") 
 GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Vector store backend: "pinecone" (default) or "local" (in-process, NumPy + mmap)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", ".cache/vectors")
+# Rewrite a namespace's files once this share of rows (and at least the minimum) is deleted/overwritten
+LOCAL_VECTOR_COMPACT_RATIO = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.5"))
+LOCAL_VECTOR_COMPACT_MIN_ROWS = int(os.getenv("LOCAL_VECTOR_COMPACT_MIN_ROWS", "1000"))
+
+# Retrieval tuning
+RETRIEVER_CACHE_SIZE = int(os.getenv("RETRIEVER_CACHE_SIZE", "256"))
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))  # wide recall from the vector store
+RERANK_STRATEGY = os.getenv("RERANK_STRATEGY", "mmr").lower()         # "mmr" or "none" (plain top-n by score)
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "8"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))                    # 1.0 = pure relevance, 0.0 = pure diversity
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Hybrid search: BM25 over the same chunks, fused with vector results (RRF)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", ".cache/lexical.sqlite3")
+LEXICAL_TOP_K = int(os.getenv("LEXICAL_TOP_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Ingestion pipeline tuning
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "2000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "300"))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+INGEST_CHUNK_QUEUE_SIZE = int(os.getenv("INGEST_CHUNK_QUEUE_SIZE", "4"))    # chunk batches parsed ahead of embedding
+INGEST_UPSERT_QUEUE_SIZE = int(os.getenv("INGEST_UPSERT_QUEUE_SIZE", "8"))  # embedded batches waiting for upload
+INGEST_UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "4"))
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))          # background ingest jobs run at once (app.py)
+
+# Uploads (app.py): spooled to disk in fixed-size pieces, capped per session
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", ".cache/uploads")
+UPLOAD_COPY_BUFFER_BYTES = int(os.getenv("UPLOAD_COPY_BUFFER_BYTES", str(1024 * 1024)))
+SESSION_MAX_UPLOAD_BYTES = int(os.getenv("SESSION_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+SESSION_MAX_CHUNKS = int(os.getenv("SESSION_MAX_CHUNKS", "20000"))
+
+# Embeddings
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "384"))  # must match the Pinecone index
+# "huggingface" (sentence-transformers) or "onnx" (exported model, see export_onnx.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", ".cache/onnx/all-MiniLM-L6-v2")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"  # int8 weights
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = onnxruntime default (all cores)
+EMBEDDING_MAX_LENGTH = int(os.getenv("EMBEDDING_MAX_LENGTH", "256"))
+# Concurrent query embeddings are collected for up to EMBED_BATCH_MAX_WAIT_MS and run as one batch
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "true").lower() == "true"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Local record of indexed files/chunks (used to skip unchanged re-ingests)
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", ".cache/manifest.sqlite3")
+
+# Chunk text lives in a local compressed docstore and vectors are upserted with IDs only.
+# Set to false when several hosts share the Pinecone index without sharing this disk.
+DOCSTORE_ENABLED = os.getenv("DOCSTORE_ENABLED", "true").lower() == "true"
+DOCSTORE_PATH = os.getenv("DOCSTORE_PATH", ".cache/docstore.sqlite3")
+DOCSTORE_COMPRESSION_LEVEL = int(os.getenv("DOCSTORE_COMPRESSION_LEVEL", "3"))  # zstd level
+
+# Session namespaces: registry plus garbage collection of idle ones
+NAMESPACE_REGISTRY_PATH = os.getenv("NAMESPACE_REGISTRY_PATH", ".cache/namespaces.sqlite3")
+NAMESPACE_TTL_SECONDS = float(os.getenv("NAMESPACE_TTL_SECONDS", str(24 * 3600)))
+NAMESPACE_SWEEP_INTERVAL_SECONDS = float(os.getenv("NAMESPACE_SWEEP_INTERVAL_SECONDS", "600"))
+NAMESPACE_SWEEP_BATCH_SIZE = int(os.getenv("NAMESPACE_SWEEP_BATCH_SIZE", "20"))
+NAMESPACE_SWEEP_MAX_DELETES_PER_SECOND = float(os.getenv("NAMESPACE_SWEEP_MAX_DELETES_PER_SECOND", "2"))  # 0 = no limit
+
+# Semantic answer cache in front of the graph
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity between questions
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+# LLM client (src/llm_client.py): concurrency cap, rate limit, retries, circuit breaker, hedging
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # max concurrent outbound LLM calls per process
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # per API key; 0 = no limit
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))  # on 429/5xx/timeouts, before any output was shown
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive failures that open the breaker
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Duplicate a call that has not produced its first token after the recent p95 latency
+LLM_HEDGING = os.getenv("LLM_HEDGING", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "300"))
+LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "3000"))  # until enough samples
+
+# Conversation memory: LangGraph checkpoints per chat session (thread ID = session ID)
+# "memory" (per process) or "sqlite" (needs langgraph-checkpoint-sqlite; sync invoke/stream only)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory").lower()
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", ".cache/checkpoints.sqlite3")
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "2"))  # "memory" backend: checkpoints kept per thread
+CONDENSE_QUERY = os.getenv("CONDENSE_QUERY", "true").lower() == "true"  # rewrite follow-ups into standalone questions
+CONDENSE_SHORT_QUESTION_WORDS = int(os.getenv("CONDENSE_SHORT_QUESTION_WORDS", "4"))  # shorter ones always need history
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))  # recent messages kept verbatim
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "6"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "300"))   # rolling summary of older messages
+
+# Web search fallback
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+# Start the web search alongside the document LLM call when retrieval looks weak.
+# With routing on, the document call only runs for top scores >= ROUTE_STRONG_SCORE,
+# so this speculates in the borderline band ROUTE_STRONG_SCORE..SPECULATIVE_SEARCH_MAX_SCORE
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "false").lower() == "true"
+SPECULATIVE_SEARCH_MAX_SCORE = float(os.getenv("SPECULATIVE_SEARCH_MAX_SCORE", "0.65"))  # top vector similarity
+
+# Route after retrieval on the top vector similarity:
+# >= strong -> answer from documents; < weak (and no keyword hits) -> web only; otherwise both
+ROUTING_ENABLED = os.getenv("ROUTING_ENABLED", "true").lower() == "true"
+ROUTE_STRONG_SCORE = float(os.getenv("ROUTE_STRONG_SCORE", "0.55"))
+ROUTE_WEAK_SCORE = float(os.getenv("ROUTE_WEAK_SCORE", "0.3"))
+
+# Observability: Prometheus text endpoint (0 = off) and an optional JSON-lines span log
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")
@@ -0,0 +1,135 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import List
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from src.rerank import estimate_tokens
+from src.config import (
+    CHECKPOINT_BACKEND, CHECKPOINT_PATH, CHECKPOINT_KEEP_LAST, HISTORY_TOKEN_BUDGET, HISTORY_MAX_MESSAGES, SUMMARY_TOKEN_BUDGET,
+    CONDENSE_SHORT_QUESTION_WORDS,
+)
+
+# Conversation state lives in LangGraph checkpoints, one thread per chat
+# session. The thread ID is the session ID, which is also the namespace, so
+# delete_namespace() removes the conversation together with the vectors.
+
+class PrunedInMemorySaver(InMemorySaver):
+    """
+    InMemorySaver that keeps only the newest `keep_last` checkpoints of each
+    thread, plus their pending writes and the channel blobs they reference.
+    The stock saver keeps one checkpoint per graph step, so a long session
+    would otherwise grow for the life of the process.
+    """
+
+    def __init__(self, keep_last: int = CHECKPOINT_KEEP_LAST):
+        super().__init__()
+        self.keep_last = max(1, keep_last)
+        self._lock = threading.Lock()
+        self._versions = {}  # (thread_id, ns) -> {checkpoint_id: channel_versions}
+        self._blob_keys = {}  # (thread_id, ns) -> blob keys written for the thread
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            versions = self._versions.setdefault((thread_id, ns), {})
+            versions[checkpoint["id"]] = dict(checkpoint["channel_versions"])
+            blob_keys = self._blob_keys.setdefault((thread_id, ns), set())
+            blob_keys.update((thread_id, ns, k, v) for k, v in new_versions.items())
+            self._prune(thread_id, ns, versions, blob_keys)
+        return saved
+
+    def _prune(self, thread_id, ns, versions, blob_keys):
+        # Checkpoint IDs sort in creation order
+        stale = sorted(versions)[:-self.keep_last]
+        if not stale:
+            return
+        checkpoints = self.storage[thread_id][ns]
+        for checkpoint_id in stale:
+            del versions[checkpoint_id]
+            checkpoints.pop(checkpoint_id, None)
+            self.writes.pop((thread_id, ns, checkpoint_id), None)
+        live = {(thread_id, ns, k, v) for kept in versions.values() for k, v in kept.items()}
+        for key in blob_keys - live:
+            self.blobs.pop(key, None)
+        blob_keys &= live
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            super().delete_thread(thread_id)
+            for key in [k for k in self._versions if k[0] == thread_id]:
+                del self._versions[key]
+                self._blob_keys.pop(key, None)
+
+def create_checkpointer(backend: str = CHECKPOINT_BACKEND):
+    if backend == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "CHECKPOINT_BACKEND=sqlite needs the langgraph-checkpoint-sqlite package "
+                "(pip install langgraph-checkpoint-sqlite), or set CHECKPOINT_BACKEND=memory"
+            ) from e
+        if os.path.dirname(CHECKPOINT_PATH):
+            os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+        return SqliteSaver(sqlite3.connect(CHECKPOINT_PATH, check_same_thread=False))
+    if backend == "memory":
+        return PrunedInMemorySaver()
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND: {backend}")
+
+checkpointer = create_checkpointer()
+
+def thread_config(session_id: str) -> dict:
+    """Config for graph runs that belong to the session's conversation."""
+    return {"configurable": {"thread_id": session_id}}
+
+def delete_thread(session_id: str):
+    checkpointer.delete_thread(session_id)
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(m.content) for m in messages)
+
+def messages_to_fold(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Oldest messages to move into the rolling summary, so that at most
+    HISTORY_MAX_MESSAGES within HISTORY_TOKEN_BUDGET stay verbatim.
+    The last exchange (question + answer) is always kept.
+    """
+    cut = 0
+    while len(messages) - cut > 2 and (
+        len(messages) - cut > HISTORY_MAX_MESSAGES or message_tokens(messages[cut:]) > HISTORY_TOKEN_BUDGET
+    ):
+        cut += 1
+    return messages[:cut]
+
+# Words that point back at something said earlier ("it", "the second one", ...)
+_REFERENCES = frozenset(
+    "it its this these those they them their theirs he him his she her former latter above previous "
+    "earlier same else another other one ones".split()
+)
+_WORD = re.compile(r"[a-z']+")
+
+def needs_condensing(question: str) -> bool:
+    """
+    Cheap check whether a follow-up depends on the conversation: it refers
+    back to something or is too short to stand on its own. Standalone
+    questions skip the extra LLM round trip of condensing.
+    """
+    words = _WORD.findall(question.lower())
+    return len(words) <= CONDENSE_SHORT_QUESTION_WORDS or any(w in _REFERENCES for w in words)
+
+def format_history(messages: List[BaseMessage], max_tokens_each: int = HISTORY_TOKEN_BUDGET // 2) -> str:
+    """Transcript for prompts; very long messages are clipped so one answer can't blow the budget."""
+    lines = []
+    for m in messages:
+        role = "User" if m.type == "human" else "Assistant"
+        text = m.content if len(m.content) <= max_tokens_each * 4 else m.content[:max_tokens_each * 4] + "..."
+        lines.append(f"{role}: {text}")
+    return "\n".join(lines)
+
+def clip_summary(summary: str) -> str:
+    """Hard cap in case the model ignores the length instruction."""
+    return summary[:SUMMARY_TOKEN_BUDGET * 4].strip()
@@ -0,0 +1,86 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+import zstandard
+
+class DocStore:
+    """
+    Chunk text and metadata, zstd-compressed in SQLite, keyed by
+    (namespace, chunk_id). The vector index then only needs IDs and values:
+    text is read back here, in bulk, for the chunks that survive re-ranking.
+    """
+
+    def __init__(self, path: str, level: int = 3):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.level = level
+        self._local = threading.local()  # zstd (de)compressors are not thread-safe
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " namespace TEXT NOT NULL, chunk_id TEXT NOT NULL, data BLOB NOT NULL,"
+            " PRIMARY KEY (namespace, chunk_id)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def _codecs(self):
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor, self._local.decompressor
+
+    def put(self, namespace: str, chunks: Iterable[Tuple[str, str, dict]]):
+        """Stores (chunk_id, text, metadata) triples, replacing existing ones."""
+        compressor, _ = self._codecs()
+        rows = [
+            (namespace, chunk_id, compressor.compress(json.dumps({"text": text, "metadata": metadata}).encode()))
+            for chunk_id, text, metadata in chunks
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, namespace: str, chunk_ids: List[str]) -> Dict[str, Tuple[str, dict]]:
+        """Returns {chunk_id: (text, metadata)} for the IDs that are stored."""
+        unique = list(dict.fromkeys(chunk_ids))
+        rows = []
+        with self._lock:
+            # SQLite caps the number of bound parameters, so query in slices
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows.extend(self._conn.execute(
+                    f"SELECT chunk_id, data FROM chunks WHERE namespace = ? AND chunk_id IN ({marks})",
+                    [namespace, *part],
+                ).fetchall())
+        _, decompressor = self._codecs()
+        found = {}
+        for chunk_id, blob in rows:
+            record = json.loads(decompressor.decompress(blob))
+            found[chunk_id] = (record["text"], record["metadata"])
+        return found
+
+    def delete(self, namespace: str, chunk_ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE namespace = ? AND chunk_id = ?",
+                [(namespace, cid) for cid in chunk_ids],
+            )
+            self._conn.commit()
+
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def stats(self, namespace: str = None):
+        where, params = ("WHERE namespace = ?", (namespace,)) if namespace is not None else ("", ())
+        with self._lock:
+            count, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks {where}", params
+            ).fetchone()
+        return {"chunks": count, "compressed_bytes": size}
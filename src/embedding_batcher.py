@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+from langchain_core.embeddings import Embeddings
+from src import telemetry
+from src.telemetry import span
+
+class EmbeddingBatcher(Embeddings):
+    """
+    Micro-batches query embeddings across concurrent sessions.
+
+    embed_query() puts the text on a queue and waits on a future. A single
+    dispatcher thread takes whatever is queued, waits up to `max_wait_ms`
+    for more (up to `max_batch_size`), embeds them in one forward pass and
+    resolves the futures. Document batches from ingestion are already
+    batched and go straight to the model.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started_at = time.time()
+        self._queries = 0
+        self._batches = 0
+        self._wait_seconds = 0.0
+
+    def _ensure_dispatcher(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True, name="embedding-batcher")
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queues one query; the future resolves to its vector."""
+        self._ensure_dispatcher()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        # 1. Everything that queued up while the previous batch was running
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # 2. A short window for requests arriving right now
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            texts = list(dict.fromkeys(text for text, _, _ in batch))  # identical questions share a row
+            try:
+                with span("embed.batch", size=len(batch)):
+                    vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for text, future, queued_at in batch:
+                telemetry.embed_queue_seconds.observe(started - queued_at)
+                future.set_result(vectors[text])
+            telemetry.embed_batch_size.observe(len(batch))
+            with self._lock:
+                self._queries += len(batch)
+                self._batches += 1
+                self._wait_seconds += sum(started - queued_at for _, _, queued_at in batch)
+
+    # --- Embeddings interface ---
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        with self._lock:
+            queries, batches, wait = self._queries, self._batches, self._wait_seconds
+        return {
+            "queries": queries,
+            "batches": batches,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "mean_queue_ms": wait / queries * 1000 if queries else 0.0,
+            "queries_per_second": queries / max(time.time() - self._started_at, 1e-9),
+            "queued": self._queue.qsize(),
+        }
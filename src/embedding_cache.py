@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalizes and collapses whitespace so trivial variants share a key."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def cache_key(model_name: str, text: str) -> str:
+    """Content address of an embedding: hash of model name + normalized text."""
+    payload = f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model with a persistent SQLite cache.
+    Entries are evicted least-recently-used once `max_entries` is exceeded.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str, max_entries: int = 200_000):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_access)")
+        self._conn.commit()
+        # Running row count, so inserts don't have to scan the table
+        (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    # --- cache plumbing ---
+    def _lookup(self, keys: List[str]):
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite caps the number of bound parameters, so query in slices
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            # A key another thread stored meanwhile holds the same vector, so it is kept as is
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items],
+            )
+            self._rows += self._conn.total_changes - before
+            if self._rows > self.max_entries:
+                cursor = self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (self._rows - self.max_entries,),
+                )
+                self._rows -= cursor.rowcount
+            self._conn.commit()
+
+    # --- Embeddings interface ---
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, t) for t in texts]
+        found = self._lookup(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        n_missing = len(missing)
+        with self._lock:
+            self.hits += len(texts) - n_missing
+            self.misses += n_missing
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh.items())
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = cache_key(self.model_name, text)
+        found = self._lookup([key])
+        with self._lock:
+            if key in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if key in found:
+            return found[key]
+        vector = self.embeddings.embed_query(text)
+        self._store([(key, vector)])
+        return vector
+
+    def stats(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, self._rows
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": size,
+            "max_entries": self.max_entries,
+        }
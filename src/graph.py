@@ -1,52 +1,156 @@
+import asyncio
+import contextvars
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, closing
 from typing import Annotated, List, TypedDict
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, message_chunk_to_message
+from langchain_core.runnables import RunnableLambda
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from src.rag import get_retriever
-from src.config import GOOGLE_API_KEY
+from src.rag import get_embedding_function, get_vectorstore, get_retriever, lexical_search, get_documents
+from src.answer_cache import answer_cache
+from src.embedding_cache import normalize_text
+from src.ttl_cache import TTLCache
+from src.rerank import pack_context, reciprocal_rank_fusion
+from src.llm_client import llm_client
+from src.conversation import (
+    checkpointer, thread_config, messages_to_fold, needs_condensing, format_history, clip_summary,
+)
+from src import telemetry
+from src.telemetry import span, traced_node
+from src.config import (
+    GOOGLE_API_KEY, CONTEXT_TOKEN_BUDGET, RERANK_TOP_N,
+    HYBRID_SEARCH, LEXICAL_TOP_K, RRF_K, ANSWER_CACHE_ENABLED,
+    SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_MAX_ENTRIES,
+    SPECULATIVE_SEARCH, SPECULATIVE_SEARCH_MAX_SCORE,
+    ROUTING_ENABLED, ROUTE_STRONG_SCORE, ROUTE_WEAK_SCORE, CONDENSE_QUERY, SUMMARY_TOKEN_BUDGET,
+)
 
 # 1. Configuration the LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-lite",
-    temperature=0,
-    max_retries=2,
-    api_key=GOOGLE_API_KEY
-)
+# The LLM client and the search tool are built on first use, not at import
+# (tests and scripts can also assign these globals directly)
+llm = None
+search_tool = None
+_clients_lock = threading.Lock()
+
+def get_llm():
+    global llm
+    if llm is None:
+        with _clients_lock:
+            if llm is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                llm = ChatGoogleGenerativeAI(
+                    model="gemini-2.5-flash-lite",
+                    temperature=0,
+                    max_retries=0,  # retries, hedging and the breaker live in src/llm_client.py
+                    api_key=GOOGLE_API_KEY
+                )
+    return llm
 
 # Initialize Search Tool
-search_tool = DuckDuckGoSearchRun()
+def get_search_tool():
+    global search_tool
+    if search_tool is None:
+        with _clients_lock:
+            if search_tool is None:
+                from langchain_community.tools import DuckDuckGoSearchRun
+                search_tool = DuckDuckGoSearchRun()
+    return search_tool
 
-class AgentState(TypedDict):
-    messages: Annotated[List[BaseMessage], add_messages]
-    context: str
-    namespace: str
+def warm_up():
+    """
+    Creates the shared resources up front (embedding model, vector store
+    client, LLM client, search tool) and runs one uncached embedding, so the
+    first question doesn't pay for loading them. Returns seconds per step.
+    """
+    timings = {}
+    for name, step in [
+        ("embedding_model", lambda: get_embedding_function().embeddings.embed_query("warm up")),
+        ("vectorstore", get_vectorstore),
+        ("llm", get_llm),
+        ("search_tool", get_search_tool),
+    ]:
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    print("Warm-up: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
+    return timings
 
-# 2. Nodes
-def retrieve_node(state: AgentState):
-    latest_question = state["messages"][-1].content
-    namespace = state["namespace"]
-    
-    print(f"Retrieving for: {latest_question} in namespace: {namespace}")
-    
-    retriever = get_retriever(namespace=namespace)
-    docs = retriever.invoke(latest_question)
-    
-    context_text = "\n\n".join([d.page_content for d in docs])
-    return {"context": context_text}
+# Web results per normalized question, so repeated fallbacks skip the search
+search_cache = TTLCache(max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl_seconds=SEARCH_CACHE_TTL_SECONDS)
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="web-search")
 
-def generate_node(state: AgentState):
-    context = state["context"]
-    question = state["messages"][-1].content
-    
-    if not context:
-        return {"messages": [BaseMessage(content="I checked your documents but couldn't find an answer.", type="ai")]}
+def _search_key(question: str) -> str:
+    return normalize_text(question).lower()
+
+def cached_search(question: str) -> str:
+    with span("web.search") as attrs:
+        results = search_cache.get(_search_key(question))
+        attrs["cache_hit"] = results is not None
+        if results is None:
+            results = get_search_tool().invoke(question)
+            search_cache.put(_search_key(question), results)
+    return results
+
+async def acached_search(question: str) -> str:
+    with span("web.search") as attrs:
+        results = search_cache.get(_search_key(question))
+        attrs["cache_hit"] = results is not None
+        if results is None:
+            results = await get_search_tool().ainvoke(question)
+            search_cache.put(_search_key(question), results)
+    return results
+
+def should_speculate(state) -> bool:
+    """
+    Cheap heuristic: a borderline top vector score means the documents may
+    well not answer. Must stay above ROUTE_STRONG_SCORE to ever apply with
+    routing on, since weaker matches never reach the document call.
+    """
+    return SPECULATIVE_SEARCH and state["metrics"].get("top_score", 0.0) < SPECULATIVE_SEARCH_MAX_SCORE
 
-    template = ChatPromptTemplate.from_messages([
-        ("system", """You are a helpful chat assistant for analyzing user-uploaded documents and answering related queries. 
+NO_ANSWER = "NO_ANSWER"
+
+class SentinelFilter:
+    """
+    Decides, token by token, what of the document answer can be shown.
+    Text is held back only while it could still be the start of NO_ANSWER,
+    so real answers stream immediately and the sentinel is caught within
+    its first few tokens (generation is then stopped early).
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.released = False
+        self.no_answer = False
+
+    def feed(self, piece: str) -> str:
+        """Adds a token; returns the text that can be shown now."""
+        self.text += piece
+        if self.no_answer:
+            return ""
+        if not self.released:
+            head = self.text.lstrip()
+            if head.startswith(NO_ANSWER):
+                self.no_answer = True
+                return ""
+            if NO_ANSWER.startswith(head):
+                return ""
+            self.released = True
+            return self.text
+        if NO_ANSWER in self.text:
+            # Sentinel after some text: already shown output must be withdrawn
+            self.no_answer = True
+            return ""
+        return piece
+
+doc_template = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful chat assistant for analyzing user-uploaded documents and answering related queries. 
 Prioritize document content; use external sources only if needed, and clearly disclose them.
 
 For each query:
@@ -62,29 +166,11 @@ Start by noting source.
         
         Context Snippets:
         {context}"""),
-        ("human", "{question}"),
-    ])
+    ("human", "{question}"),
+])
 
-    doc_chain = template | llm
-    
-    # Try 1: Ask the Document
-    try:
-        response = doc_chain.invoke({"context": context, "question": question})
-        content = response.content.strip()
-        
-        # If the document had the answer, return it immediately
-        if "NO_ANSWER" not in content:
-            return {"messages": [response]}
-            
-        # --- FALLBACK: WEB SEARCH MODE ---
-        print("Answer not in doc. Switching to Web Search...")
-        
-        # 1. Perform Search
-        web_results = search_tool.invoke(question)
-        
-        # 2. Generate Answer with Warning
-        web_template = ChatPromptTemplate.from_messages([
-            ("system", """You are a helpful assistant.
+web_template = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful assistant.
             The user's document did not contain the answer, so we searched the internet.
             
             Instructions:
@@ -94,43 +180,568 @@ Start by noting source.
             
             Web Search Results:
             {web_results}"""),
-            ("human", "{question}"),
-        ])
+    ("human", "{question}"),
+])
+
+combined_template = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful chat assistant for analyzing user-uploaded documents and answering related queries.
+The user's documents only partly match this question, so web search results are included as well.
+
+Instructions:
+1. Answer from the Context Snippets first.
+2. Use the Web Search Results only for what the documents don't cover.
+3. Prefix anything taken from the web with "This part is from external sources (internet), not your document:".
+4. Keep responses clear, structured. No hallucinations.
+
+        Context Snippets:
+        {context}
+
+        Web Search Results:
+        {web_results}"""),
+    ("human", "{question}"),
+])
+
+condense_template = ChatPromptTemplate.from_messages([
+    ("system", """Rewrite the user's latest question as a standalone question that can be understood
+without the conversation (resolve pronouns and references like "it" or "the second one").
+If it is already standalone, return it unchanged. Output only the question.
+
+        Summary of the earlier conversation:
+        {summary}
+
+        Recent messages:
+        {history}"""),
+    ("human", "{question}"),
+])
+
+summary_template = ChatPromptTemplate.from_messages([
+    ("system", """Update the running summary of a conversation between a user and a document assistant
+with the new messages below. Keep the topics, documents, names and facts the user may refer back to;
+drop greetings and repetition. Use at most {max_words} words. Output only the summary.
+
+        Current summary:
+        {summary}"""),
+    ("human", "New messages:\n{messages}"),
+])
+
+def merge_metrics(current: dict, update: dict) -> dict:
+    """
+    Reducer so every node can add its own timings/counters to the state.
+    The state outlives a turn (checkpointer), so the first node of a turn
+    sends {"new_turn": True, ...} to start a fresh dict.
+    """
+    if update and update.get("new_turn"):
+        return {k: v for k, v in update.items() if k != "new_turn"}
+    return {**(current or {}), **(update or {})}
+
+class AgentState(TypedDict):
+    messages: Annotated[List[BaseMessage], add_messages]
+    summary: str  # rolling summary of messages compacted out of `messages`
+    query: str    # the latest question rewritten as a standalone question
+    context: str
+    namespace: str
+    query_embedding: List[float]
+    scores: List[float]
+    route: str
+    request_id: str
+    metrics: Annotated[dict, merge_metrics]
+
+def turn_input(question: str, namespace: str) -> dict:
+    """
+    Graph input for one question. With the checkpointer the conversation
+    (messages, summary) carries over from the previous turn of the same
+    thread; everything computed per turn is reset here so nothing from the
+    last question can leak into this one.
+    """
+    return {
+        "messages": [HumanMessage(content=question)], "namespace": namespace, "request_id": "",
+        "query": "", "context": "", "route": "", "scores": [], "query_embedding": [],
+        "metrics": {"new_turn": True},
+    }
+
+def _question(state: AgentState) -> str:
+    return state.get("query") or state["messages"][-1].content
+
+# 2. Nodes
+def _condense_inputs(state: AgentState):
+    """
+    Prompt inputs for rewriting the question, or None when there is no
+    earlier conversation or the question already stands on its own.
+    """
+    history = state["messages"][:-1]
+    question = state["messages"][-1].content
+    if not CONDENSE_QUERY or not (history or state.get("summary")) or not needs_condensing(question):
+        return None
+    return {
+        "summary": state.get("summary") or "(none)",
+        "history": format_history(history) or "(none)",
+        "question": question,
+    }
+
+def _condense_result(question: str, query: str, start: float):
+    metrics = {"new_turn": True, "started_at": time.time(), "condense_ms": (time.perf_counter() - start) * 1000}
+    if query != question:
+        print(f"Standalone question: {query}")
+    return {"query": query or question, "metrics": metrics}
+
+def condense_node(state: AgentState):
+    """Turns a follow-up into a standalone question for caching and retrieval (first turn: unchanged)."""
+    start = time.perf_counter()
+    question = state["messages"][-1].content
+    inputs = _condense_inputs(state)
+    query = question
+    if inputs is not None:
+        try:
+            with span("llm.condense"):
+                query = llm_client.invoke(condense_template | get_llm(), inputs).content.strip()
+        except Exception as e:
+            print(f"Could not condense the question, using it as is: {e}")
+    return _condense_result(question, query, start)
+
+async def acondense_node(state: AgentState):
+    start = time.perf_counter()
+    question = state["messages"][-1].content
+    inputs = _condense_inputs(state)
+    query = question
+    if inputs is not None:
+        try:
+            with span("llm.condense"):
+                query = (await llm_client.ainvoke(condense_template | get_llm(), inputs)).content.strip()
+        except Exception as e:
+            print(f"Could not condense the question, using it as is: {e}")
+    return _condense_result(question, query, start)
+
+def _check_answer_cache(state: AgentState, query_embedding: List[float], embed_ms: float):
+    namespace = state["namespace"]
+    metrics = {"embed_ms": embed_ms, "cache_hit": False}
+
+    if ANSWER_CACHE_ENABLED:
+        start = time.perf_counter()
+        answer = answer_cache.lookup(namespace, query_embedding)
+        metrics["cache_ms"] = (time.perf_counter() - start) * 1000
+        if answer is not None:
+            print(f"Answer cache hit in namespace: {namespace}")
+            metrics["cache_hit"] = True
+            metrics["answer_source"] = "cache"
+            return {
+                "messages": [BaseMessage(content=answer, type="ai")],
+                "query_embedding": query_embedding,
+                "metrics": metrics,
+            }
+
+    return {"query_embedding": query_embedding, "metrics": metrics}
+
+def cache_node(state: AgentState):
+    """Embeds the question once and answers from the semantic cache when possible."""
+    start = time.perf_counter()
+    with span("embed.query"):
+        query_embedding = get_embedding_function().embed_query(_question(state))
+    return _check_answer_cache(state, query_embedding, (time.perf_counter() - start) * 1000)
+
+async def acache_node(state: AgentState):
+    # Embedding is CPU-bound, so it runs off the event loop
+    start = time.perf_counter()
+    question = _question(state)
+    with span("embed.query"):
+        query_embedding = await asyncio.to_thread(lambda: get_embedding_function().embed_query(question))
+    return _check_answer_cache(state, query_embedding, (time.perf_counter() - start) * 1000)
+
+def route_after_cache(state: AgentState):
+    return "remember" if state["metrics"].get("cache_hit") else "retrieve"
+
+def retrieve_node(state: AgentState):
+    latest_question = _question(state)
+    namespace = state["namespace"]
+    
+    print(f"Retrieving for: {latest_question} in namespace: {namespace}")
+    
+    retriever = get_retriever(namespace=namespace)
+    docs, metrics = retriever.retrieve(latest_question, query_vector=state.get("query_embedding"))
+    scores = [d.metadata["score"] for d in docs if "score" in d.metadata]
+    metrics["top_score"] = max(scores, default=0.0)
+
+    # Hybrid: fuse BM25 hits with the vector ranking
+    if HYBRID_SEARCH:
+        start = time.perf_counter()
+        lexical = lexical_search(namespace, latest_question, LEXICAL_TOP_K)
+        fused = reciprocal_rank_fusion([[d.id for d in docs], [cid for cid, _ in lexical]], k=RRF_K)
+        docs = get_documents(namespace, [cid for cid, _ in fused[:RERANK_TOP_N]], known=docs)
+        metrics["lexical_ms"] = (time.perf_counter() - start) * 1000
+        metrics["lexical_hits"] = len(lexical)
+
+    # Only the best chunks that fit the token budget go into the prompt
+    start = time.perf_counter()
+    docs = pack_context(docs, CONTEXT_TOKEN_BUDGET)
+    context_text = "\n\n".join([d.page_content for d in docs])
+    metrics["pack_ms"] = (time.perf_counter() - start) * 1000
+    metrics["context_docs"] = len(docs)
+    telemetry.chunks_retrieved_total.inc(len(docs))
+    metrics["context_chars"] = len(context_text)
+
+    print(
+        f"Retrieval: {metrics['candidates']} candidates in {metrics['recall_ms']:.0f}ms, "
+        f"re-ranked in {metrics['rerank_ms']:.1f}ms, {len(docs)} chunks / {len(context_text)} chars in context"
+    )
+
+    route = choose_route(context_text, scores, metrics.get("lexical_hits", 0))
+    metrics["route"] = route
+    return {"context": context_text, "scores": scores, "route": route, "metrics": metrics}
+
+async def aretrieve_node(state: AgentState):
+    # Index queries and local BM25/SQLite lookups are blocking client calls;
+    # running them in a worker thread keeps the event loop free for other questions.
+    return await asyncio.to_thread(retrieve_node, state)
+
+# Every routing decision is counted here (and recorded per request in metrics["route"])
+route_counts = Counter()
+
+def choose_route(context: str, scores: List[float], lexical_hits: int = 0) -> str:
+    """
+    Decides from retrieval scores alone whether the documents can answer:
+      "docs"     - strong match: answer from the documents
+      "web"      - nothing retrieved, or only weak matches: go straight to web search
+      "combined" - in between: one LLM call with both documents and web results
+    """
+    top = max(scores, default=0.0)
+    if not ROUTING_ENABLED:
+        route = "docs"
+    elif not context:
+        route = "web"
+    elif top >= ROUTE_STRONG_SCORE:
+        route = "docs"
+    elif top < ROUTE_WEAK_SCORE and not lexical_hits:
+        route = "web"
+    else:
+        route = "combined"
+    route_counts[route] += 1
+    telemetry.routes_total.inc(route=route)
+    print(f"Route: {route} (top score {top:.2f}, {lexical_hits} lexical hits)")
+    return route
+
+def route_after_retrieve(state: AgentState):
+    return {"docs": "generate", "web": "web_search", "combined": "combined"}[state["route"]]
+
+def _empty_context_result():
+    return {
+        "messages": [BaseMessage(content="I checked your documents but couldn't find an answer.", type="ai")],
+        "metrics": {"answer_source": "none"},
+    }
+
+def _error_result(e: Exception):
+    # Simple Error Handling
+    return {
+        "messages": [BaseMessage(content=f"An error occurred: {str(e)}", type="ai")],
+        "metrics": {"answer_source": "error"},
+    }
+
+def _finish_stream(chunks, sentinel, write):
+    if not chunks or (sentinel is not None and sentinel.no_answer):
+        if sentinel is not None and sentinel.released:
+            write({"reset": True})
+        return None
+    return message_chunk_to_message(sum(chunks[1:], chunks[0]))
+
+def _stream_answer(chain, inputs: dict, write, metrics: dict, phase: str, sentinel: SentinelFilter = None):
+    """
+    Streams a chain's tokens to `write` and records time-to-first-token.
+    Returns the full message, or None if the sentinel was hit (or nothing came back).
+    """
+    start = time.perf_counter()
+    chunks = []
+    with span(f"llm.{phase}") as attrs, closing(llm_client.stream(chain, inputs)) as stream:
+        for chunk in stream:
+            if not chunks:
+                metrics[f"{phase}_ttft_ms"] = attrs["ttft_ms"] = (time.perf_counter() - start) * 1000
+            chunks.append(chunk)
+            visible = sentinel.feed(chunk.content) if sentinel else chunk.content
+            if visible:
+                write({"token": visible})
+            if sentinel is not None and sentinel.no_answer:
+                break  # no need to pay for the rest of the generation
+    metrics[f"{phase}_llm_ms"] = (time.perf_counter() - start) * 1000
+    return _finish_stream(chunks, sentinel, write)
+
+async def _astream_answer(chain, inputs: dict, write, metrics: dict, phase: str, sentinel: SentinelFilter = None):
+    start = time.perf_counter()
+    chunks = []
+    with span(f"llm.{phase}") as attrs:
+        async with aclosing(llm_client.astream(chain, inputs)) as stream:
+            async for chunk in stream:
+                if not chunks:
+                    metrics[f"{phase}_ttft_ms"] = attrs["ttft_ms"] = (time.perf_counter() - start) * 1000
+                chunks.append(chunk)
+                visible = sentinel.feed(chunk.content) if sentinel else chunk.content
+                if visible:
+                    write({"token": visible})
+                if sentinel is not None and sentinel.no_answer:
+                    break
+    metrics[f"{phase}_llm_ms"] = (time.perf_counter() - start) * 1000
+    return _finish_stream(chunks, sentinel, write)
+
+def _answer_from_web(question: str, write, metrics: dict, pending_search=None):
+    metrics["answer_source"] = "web"
+
+    # 1. Perform Search
+    start = time.perf_counter()
+    web_results = pending_search.result() if pending_search is not None else cached_search(question)
+    metrics["search_ms"] = (time.perf_counter() - start) * 1000
+
+    # 2. Generate Answer with Warning
+    web_chain = web_template | get_llm()
+    web_response = _stream_answer(web_chain, {"web_results": web_results, "question": question}, write, metrics, "web")
+    return {"messages": [web_response or BaseMessage(content="", type="ai")], "metrics": metrics}
+
+async def _aanswer_from_web(question: str, write, metrics: dict, pending_search=None):
+    metrics["answer_source"] = "web"
+
+    start = time.perf_counter()
+    web_results = await pending_search if pending_search is not None else await acached_search(question)
+    metrics["search_ms"] = (time.perf_counter() - start) * 1000
+
+    web_chain = web_template | get_llm()
+    web_response = await _astream_answer(
+        web_chain, {"web_results": web_results, "question": question}, write, metrics, "web"
+    )
+    return {"messages": [web_response or BaseMessage(content="", type="ai")], "metrics": metrics}
+
+def generate_node(state: AgentState):
+    context = state["context"]
+    question = _question(state)
+    
+    if not context:
+        return _empty_context_result()
+
+    doc_chain = doc_template | get_llm()
+    metrics = {"prompt_chars": len(context) + len(question), "answer_source": "document"}
+
+    # Tokens are pushed to stream(stream_mode="custom") consumers as they arrive
+    write = get_stream_writer()
+
+    # Weak retrieval: start the web search now, in parallel with the doc answer
+    # (under this request's ID, so its spans are traced with the rest of the turn)
+    speculative = (
+        _search_pool.submit(contextvars.copy_context().run, cached_search, question)
+        if should_speculate(state) else None
+    )
+    metrics["speculative_search"] = speculative is not None
+
+    # Try 1: Ask the Document
+    try:
+        response = _stream_answer(
+            doc_chain, {"context": context, "question": question}, write, metrics, "doc", SentinelFilter()
+        )
         
-        web_chain = web_template | llm
-        web_response = web_chain.invoke({"web_results": web_results, "question": question})
+        # If the document had the answer, return it immediately
+        if response is not None:
+            if speculative is not None:
+                speculative.cancel()  # no-op if already running; its result only warms the cache
+            return {"messages": [response], "metrics": metrics}
+            
+        # --- FALLBACK: WEB SEARCH MODE ---
+        print("Answer not in doc. Switching to Web Search...")
+        metrics["doc_fallback"] = True
+        telemetry.doc_fallbacks_total.inc()
         
-        return {"messages": [web_response]}
+        # Search (or wait for the speculative one), then answer with a warning
+        return _answer_from_web(question, write, metrics, speculative)
 
     except Exception as e:
-        # Simple Error Handling
-        return {"messages": [BaseMessage(content=f"An error occurred: {str(e)}", type="ai")]}
-
-    # # Retry loop logic
-    # max_retries = 3
-    # for attempt in range(max_retries):
-    #     try:
-    #         response = chain.invoke({"context": context, "question": question})
-    #         return {"messages": [response]}
-    #     except Exception as e:
-    #         if "503" in str(e) or "overloaded" in str(e).lower():
-    #             if attempt < max_retries - 1:
-    #                 wait_time = 2 * (attempt + 1)
-    #                 print(f"Google Server 503. Retrying in {wait_time}s...")
-    #                 time.sleep(wait_time)
-    #                 continue
-    #         raise e
-    
-    # chain = template | llm
-    # response = chain.invoke({"context": context, "question": question})
-    
-    # return {"messages": [response]}
+        if speculative is not None:
+            speculative.cancel()
+        return _error_result(e)
+
+async def agenerate_node(state: AgentState):
+    """Async twin of generate_node: same flow, non-blocking LLM and search calls."""
+    context = state["context"]
+    question = _question(state)
+
+    if not context:
+        return _empty_context_result()
+
+    doc_chain = doc_template | get_llm()
+    metrics = {"prompt_chars": len(context) + len(question), "answer_source": "document"}
+    write = get_stream_writer()
+
+    speculative = asyncio.create_task(acached_search(question)) if should_speculate(state) else None
+    metrics["speculative_search"] = speculative is not None
+
+    try:
+        response = await _astream_answer(
+            doc_chain, {"context": context, "question": question}, write, metrics, "doc", SentinelFilter()
+        )
+        if response is not None:
+            if speculative is not None:
+                speculative.cancel()
+            return {"messages": [response], "metrics": metrics}
+
+        print("Answer not in doc. Switching to Web Search...")
+        metrics["doc_fallback"] = True
+        telemetry.doc_fallbacks_total.inc()
+        return await _aanswer_from_web(question, write, metrics, speculative)
+
+    except Exception as e:
+        if speculative is not None:
+            speculative.cancel()
+        return _error_result(e)
+
+def web_search_node(state: AgentState):
+    """Weak or empty retrieval: skip the document LLM call entirely."""
+    question = _question(state)
+    metrics = {"prompt_chars": len(question)}
+    try:
+        return _answer_from_web(question, get_stream_writer(), metrics)
+    except Exception as e:
+        return _error_result(e)
+
+async def aweb_search_node(state: AgentState):
+    question = _question(state)
+    metrics = {"prompt_chars": len(question)}
+    try:
+        return await _aanswer_from_web(question, get_stream_writer(), metrics)
+    except Exception as e:
+        return _error_result(e)
+
+def combined_node(state: AgentState):
+    """Partial match: one LLM call over both the document context and web results."""
+    context = state["context"]
+    question = _question(state)
+    metrics = {"prompt_chars": len(context) + len(question), "answer_source": "combined"}
+    try:
+        start = time.perf_counter()
+        web_results = cached_search(question)
+        metrics["search_ms"] = (time.perf_counter() - start) * 1000
+
+        chain = combined_template | get_llm()
+        inputs = {"context": context, "web_results": web_results, "question": question}
+        response = _stream_answer(chain, inputs, get_stream_writer(), metrics, "combined")
+        return {"messages": [response or BaseMessage(content="", type="ai")], "metrics": metrics}
+    except Exception as e:
+        return _error_result(e)
+
+async def acombined_node(state: AgentState):
+    context = state["context"]
+    question = _question(state)
+    metrics = {"prompt_chars": len(context) + len(question), "answer_source": "combined"}
+    try:
+        start = time.perf_counter()
+        web_results = await acached_search(question)
+        metrics["search_ms"] = (time.perf_counter() - start) * 1000
+
+        chain = combined_template | get_llm()
+        inputs = {"context": context, "web_results": web_results, "question": question}
+        response = await _astream_answer(chain, inputs, get_stream_writer(), metrics, "combined")
+        return {"messages": [response or BaseMessage(content="", type="ai")], "metrics": metrics}
+    except Exception as e:
+        return _error_result(e)
+
+def remember_node(state: AgentState):
+    """
+    Last node of every run: stores real answers (not errors, empty results or
+    cache hits) in the semantic cache and records the per-question metrics.
+    """
+    metrics = state["metrics"]
+    cost_ms = (time.time() - metrics["started_at"]) * 1000
+    if ANSWER_CACHE_ENABLED and metrics.get("answer_source") in ("document", "web", "combined"):
+        answer_cache.store(state["namespace"], state["query_embedding"], state["messages"][-1].content, cost_ms)
+
+    telemetry.requests_total.inc(answer_source=metrics.get("answer_source", "unknown"))
+    telemetry.request_seconds.observe(cost_ms / 1000)
+    telemetry.prompt_chars_total.inc(metrics.get("prompt_chars", 0))
+    return {}
+
+def _compact_inputs(state: AgentState):
+    folded = messages_to_fold(state["messages"])
+    if not folded:
+        return folded, None
+    return folded, {
+        "summary": state.get("summary") or "(none)",
+        "messages": format_history(folded),
+        "max_words": int(SUMMARY_TOKEN_BUDGET * 0.75),
+    }
+
+def _compact_result(state: AgentState, folded, summary):
+    if summary is None:
+        # Still drop them: the history must stay bounded even while the LLM is failing
+        summary = state.get("summary", "")
+    print(f"Compacted {len(folded)} messages into the conversation summary")
+    return {"summary": clip_summary(summary), "messages": [RemoveMessage(id=m.id) for m in folded]}
+
+# Compaction runs after the turn, off the critical path (see compact_later)
+_compact_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compact")
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+def compact_history(session_id: str):
+    """
+    Keeps the conversation bounded: once the verbatim history is over its
+    budget, the oldest messages are folded into the rolling summary and
+    removed, so prompts stay the same size however long the chat runs.
+    """
+    config = thread_config(session_id)
+    state = app.get_state(config).values
+    if not state.get("messages"):
+        return
+    folded, inputs = _compact_inputs(state)
+    if not folded:
+        return
+    summary = None
+    try:
+        with span("llm.compact"):
+            summary = llm_client.invoke(summary_template | get_llm(), inputs).content
+    except Exception as e:
+        print(f"Could not update the conversation summary: {e}")
+    if not app.get_state(config).values:
+        return  # the session ended meanwhile; don't bring its thread back
+    app.update_state(config, _compact_result(state, folded, summary), as_node="remember")
+
+def compact_later(session_id: str):
+    """
+    Runs compact_history in the background once a turn is done, so the
+    summary LLM call never holds up an answer. Call it after the run has
+    finished; at most one compaction per session runs at a time.
+    Returns the future, or None if one is already running.
+    """
+    with _compacting_lock:
+        if session_id in _compacting:
+            return None
+        _compacting.add(session_id)
+
+    def run():
+        try:
+            compact_history(session_id)
+        except Exception as e:
+            print(f"Could not compact the conversation: {e}")
+        finally:
+            with _compacting_lock:
+                _compacting.discard(session_id)
+
+    return _compact_pool.submit(contextvars.copy_context().run, run)
 
 # 3. Graph
+# Each node has a sync and an async implementation, so the compiled app works
+# with both invoke/stream and ainvoke/astream. Every node runs under the
+# request's ID and is timed as a `node.<name>` span (see src/telemetry.py).
+def _node(name: str, func, afunc=None):
+    if afunc is None:
+        return traced_node(name, func)
+    return RunnableLambda(traced_node(name, func), afunc=traced_node(name, afunc))
+
 workflow = StateGraph(AgentState)
-workflow.add_node("retrieve", retrieve_node)
-workflow.add_node("generate", generate_node)
-workflow.add_edge(START, "retrieve")
-workflow.add_edge("retrieve", "generate")
-workflow.add_edge("generate", END)
-app = workflow.compile()
+workflow.add_node("condense", _node("condense", condense_node, acondense_node))
+workflow.add_node("cache", _node("cache", cache_node, acache_node))
+workflow.add_node("retrieve", _node("retrieve", retrieve_node, aretrieve_node))
+workflow.add_node("generate", _node("generate", generate_node, agenerate_node))
+workflow.add_node("web_search", _node("web_search", web_search_node, aweb_search_node))
+workflow.add_node("combined", _node("combined", combined_node, acombined_node))
+workflow.add_node("remember", _node("remember", remember_node))
+workflow.add_edge(START, "condense")
+workflow.add_edge("condense", "cache")
+workflow.add_conditional_edges("cache", route_after_cache, ["retrieve", "remember"])
+workflow.add_conditional_edges("retrieve", route_after_retrieve, ["generate", "web_search", "combined"])
+workflow.add_edge("generate", "remember")
+workflow.add_edge("web_search", "remember")
+workflow.add_edge("combined", "remember")
+workflow.add_edge("remember", END)
+# Runs need a thread: app.invoke(turn_input(...), config=thread_config(session_id)),
+# followed by compact_later(session_id) to keep the conversation bounded
+app = workflow.compile(checkpointer=checkpointer)
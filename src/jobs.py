@@ -0,0 +1,224 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from src.config import (
+    INGEST_JOB_WORKERS, UPLOAD_SPOOL_DIR, UPLOAD_COPY_BUFFER_BYTES,
+    SESSION_MAX_UPLOAD_BYTES, SESSION_MAX_CHUNKS,
+)
+from src.chunking import count_pages
+from src.telemetry import request
+
+# Jobs run on threads rather than processes: they share this process's
+# embedding model, vector store and manifest, and chunks become searchable
+# batch by batch, so chat works while an upload is still in flight.
+
+class QuotaExceeded(Exception):
+    """A session went over SESSION_MAX_UPLOAD_BYTES or SESSION_MAX_CHUNKS."""
+
+def spool_upload(fileobj, suffix: str = ".pdf", spool_dir: str = UPLOAD_SPOOL_DIR) -> str:
+    """
+    Copies a file-like upload to the spool directory in UPLOAD_COPY_BUFFER_BYTES
+    pieces (never the whole file at once). Returns the spooled path.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=spool_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(fileobj, f, length=UPLOAD_COPY_BUFFER_BYTES)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+class IngestJob:
+    """Status of one background PDF ingest. Updated by the worker thread."""
+
+    def __init__(self, file_path: str, namespace: str, source: str, cleanup: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.file_path = file_path
+        self.namespace = namespace
+        self.source = source
+        self.cleanup = cleanup
+        self.size_bytes = os.path.getsize(file_path)
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.error = None
+        self.pages_total = None
+        self.pages_done = 0
+        self.chunks_done = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _on_page(self, page):
+        with self._lock:
+            self.pages_done += 1
+
+    def _on_batch(self, uploaded):
+        with self._lock:
+            self.chunks_done += sum(len(ids) for ids in uploaded.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "source": self.source,
+                "status": self.status,
+                "pages_done": self.pages_done,
+                "pages_total": self.pages_total,
+                "chunks_done": self.chunks_done,
+                "error": self.error,
+            }
+
+class JobQueue:
+    """
+    Runs ingest jobs on a small thread pool. Jobs are looked up by ID and
+    listed per namespace, so the UI can poll progress without blocking.
+    """
+
+    def __init__(self, max_workers: int, max_bytes: int = SESSION_MAX_UPLOAD_BYTES,
+                 max_chunks: int = SESSION_MAX_CHUNKS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        self._bytes = Counter()   # namespace -> bytes submitted
+        self._chunks = Counter()  # namespace -> chunks uploaded
+
+    def check_bytes(self, namespace: str, size_bytes: int):
+        """Raises QuotaExceeded if `size_bytes` more would put the namespace over its byte limit."""
+        with self._lock:
+            used = self._bytes[namespace]
+        if used + size_bytes > self.max_bytes:
+            raise QuotaExceeded(
+                f"Upload limit reached: {used / 2**20:.1f} of {self.max_bytes / 2**20:.1f} MB used this session"
+            )
+
+    def submit(self, file_path: str, namespace: str, source: str = None, cleanup: bool = False) -> IngestJob:
+        """
+        Queues `file_path` for ingest. With `cleanup`, the file is removed when
+        the job ends (or right away if the session's byte limit is exceeded).
+        """
+        try:
+            job = IngestJob(file_path, namespace, source or os.path.basename(file_path), cleanup)
+            with self._lock:
+                if self._bytes[namespace] + job.size_bytes > self.max_bytes:
+                    raise QuotaExceeded(
+                        f"{job.source} would exceed this session's {self.max_bytes / 2**20:.1f} MB upload limit"
+                    )
+                self._bytes[namespace] += job.size_bytes
+                self._jobs[job.id] = job
+        except BaseException:
+            if cleanup and os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        self._pool.submit(self._run, job)
+        return job
+
+    def _count_chunks(self, job: IngestJob, uploaded):
+        job._on_batch(uploaded)
+        n = sum(len(ids) for ids in uploaded.values())
+        with self._lock:
+            self._chunks[job.namespace] += n
+            over = self._chunks[job.namespace] > self.max_chunks
+        if over and not job.cancelled():
+            job.error = f"Session chunk limit ({self.max_chunks}) reached"
+            job.cancel()
+
+    def _run(self, job: IngestJob):
+        # Spans recorded while ingesting carry the job ID as their request ID
+        with request(job.id):
+            self._ingest(job)
+
+    def _ingest(self, job: IngestJob):
+        from src.rag import ingest_pdf, IngestCancelled
+
+        try:
+            if job.cancelled():
+                job.status = "cancelled"
+                return
+            if self.usage(job.namespace)["chunks"] >= self.max_chunks:
+                raise QuotaExceeded(f"Session chunk limit ({self.max_chunks}) reached")
+            job.status = "running"
+            job.pages_total = count_pages(job.file_path)
+            ingest_pdf(
+                job.file_path, namespace=job.namespace, source=job.source,
+                on_page=job._on_page, on_batch=lambda uploaded: self._count_chunks(job, uploaded),
+                should_stop=job.cancelled,
+            )
+            # The limit may have been crossed by the final batch, after which nothing was left to stop
+            job.error = None
+            job.status = "done"
+        except IngestCancelled:
+            # Cancelled by the user, or stopped at the chunk limit (job.error says so)
+            job.status = "failed" if job.error else "cancelled"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            print(f"Ingest job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            if job.cleanup and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            job._done.set()
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, namespace: str):
+        with self._lock:
+            return [j for j in self._jobs.values() if j.namespace == namespace]
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+
+    def cancel_namespace(self, namespace: str, timeout: float = 30.0):
+        """
+        Cancels every unfinished job for the namespace and waits for them to
+        stop, so nothing is upserted after the namespace is deleted.
+        """
+        jobs = self.jobs(namespace)
+        for job in jobs:
+            job.cancel()
+        deadline = time.monotonic() + timeout
+        for job in jobs:
+            job.wait(max(0.0, deadline - time.monotonic()))
+
+    def usage(self, namespace: str) -> dict:
+        with self._lock:
+            return {"bytes": self._bytes[namespace], "chunks": self._chunks[namespace]}
+
+    def forget(self, namespace: str):
+        """Drops the namespace's jobs and resets its quota (after the namespace is deleted)."""
+        with self._lock:
+            self._jobs = {k: j for k, j in self._jobs.items() if j.namespace != namespace}
+            self._bytes.pop(namespace, None)
+            self._chunks.pop(namespace, None)
+
+# One queue per server process, shared by all Streamlit sessions
+ingest_jobs = JobQueue(INGEST_JOB_WORKERS)
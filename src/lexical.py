@@ -0,0 +1,119 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+# Keeps things like "q3", "3.2" and "x_1" as single terms
+_TOKEN = re.compile(r"\w+(?:\.\w+)*")
+
+# Function words match nearly every chunk: left in, "What is the capital
+# of France?" gets BM25 hits in any English document
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+now of off on once only or other our ours ourselves out over own same she should so some such than that the
+their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """
+    Per-namespace inverted index (BM25 scoring) stored in SQLite.
+    Built at ingest time alongside the vectors, so exact terms such as
+    question numbers, formulas and names can be matched lexically.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                namespace TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (namespace, chunk_id)
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                namespace TEXT NOT NULL,
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (namespace, term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_chunk ON postings(namespace, chunk_id);
+        """)
+        self._conn.commit()
+
+    def _remove(self, namespace: str, chunk_ids: List[str]):
+        self._conn.executemany(
+            "DELETE FROM postings WHERE namespace = ? AND chunk_id = ?",
+            [(namespace, cid) for cid in chunk_ids],
+        )
+        self._conn.executemany(
+            "DELETE FROM docs WHERE namespace = ? AND chunk_id = ?",
+            [(namespace, cid) for cid in chunk_ids],
+        )
+
+    def add(self, namespace: str, chunks: Iterable[Tuple[str, str]]):
+        """Indexes (chunk_id, text) pairs, replacing any existing entry for the same ID."""
+        chunks = list(chunks)
+        docs, postings = [], []
+        for chunk_id, text in chunks:
+            counts = Counter(tokenize(text))
+            docs.append((namespace, chunk_id, sum(counts.values())))
+            postings.extend((namespace, term, chunk_id, tf) for term, tf in counts.items())
+        with self._lock:
+            self._remove(namespace, [cid for cid, _ in chunks])
+            self._conn.executemany("INSERT INTO docs VALUES (?, ?, ?)", docs)
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+            self._conn.commit()
+
+    def delete(self, namespace: str, chunk_ids: Iterable[str]):
+        with self._lock:
+            self._remove(namespace, list(chunk_ids))
+            self._conn.commit()
+
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM docs WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def search(self, namespace: str, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """Returns up to `k` (chunk_id, bm25 score) pairs, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            n_docs, avg_len = self._conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM docs WHERE namespace = ?", (namespace,)
+            ).fetchone()
+            if not n_docs:
+                return []
+            marks = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, d.length FROM postings p"
+                f" JOIN docs d ON d.namespace = p.namespace AND d.chunk_id = p.chunk_id"
+                f" WHERE p.namespace = ? AND p.term IN ({marks})",
+                [namespace, *terms],
+            ).fetchall()
+
+        df = Counter(term for term, _, _, _ in rows)
+        scores = Counter()
+        for term, chunk_id, tf, length in rows:
+            idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * length / (avg_len or 1))
+            scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+        return scores.most_common(k)
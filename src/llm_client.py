@@ -0,0 +1,536 @@
+import asyncio
+import contextvars
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src import telemetry
+from src.config import (
+    GOOGLE_API_KEY, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_BURST,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS,
+    LLM_HEDGING, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY_MS, LLM_HEDGE_DEFAULT_DELAY_MS,
+)
+
+# Every LLM call in the graph goes through one LLMClient: a concurrency cap,
+# a rate limit per API key, retries with backoff on overload errors, a
+# circuit breaker, and a hedged duplicate request for slow responses.
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the API while the circuit breaker is open."""
+
+_RETRYABLE = re.compile(
+    r"\b(429|500|502|503|504)\b|overloaded|unavailable|resource.?exhausted|rate.?limit|deadline|timed? ?out",
+    re.IGNORECASE,
+)
+
+def is_retryable(e: Exception) -> bool:
+    """Overload and transient errors (HTTP 429/5xx, timeouts), not bad requests."""
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    return bool(_RETRYABLE.search(f"{type(e).__name__} {e}"))
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up. Thread-safe."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Takes a token if there is one; otherwise returns the seconds until there will be."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        return self._reserve() == 0.0
+
+    def acquire(self):
+        while (wait := self._reserve()) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        while (wait := self._reserve()) > 0:
+            await asyncio.sleep(wait)
+
+# One bucket per API key, shared by every client in the process
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def bucket_for(api_key: str, requests_per_minute: float, burst: int):
+    if requests_per_minute <= 0:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(api_key)
+        if bucket is None:
+            bucket = _buckets[api_key] = TokenBucket(requests_per_minute / 60, burst)
+        return bucket
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive overload failures; calls then
+    fail fast for `reset_seconds`, after which one trial call is let through
+    (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError while open. Returns True if this call is the half-open trial."""
+        with self._lock:
+            if self.state == "open":
+                remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(f"The LLM API is overloaded; trying again in {max(1, round(remaining))}s.")
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open":
+                if self._trial_running:
+                    raise CircuitOpenError("The LLM API is overloaded; a trial request is in progress.")
+                self._trial_running = True
+                return True
+            return False
+
+    def abandon_trial(self):
+        """
+        The trial call ended without an outcome (cancelled, interrupted).
+        Re-opens the breaker, so the next trial is let through after
+        `reset_seconds` instead of every call waiting on this one forever.
+        """
+        with self._lock:
+            if self.state == "half_open" and self._trial_running:
+                self._trial_running = False
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"LLM circuit breaker open after {self.failures} failures")
+                    telemetry.llm_breaker_opens_total.inc()
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class LatencyWindow:
+    """The most recent `size` latencies, for percentiles."""
+
+    def __init__(self, size: int = 200):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, p: float, min_samples: int = 20):
+        with self._lock:
+            values = sorted(self._values)
+        if len(values) < min_samples:
+            return None
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+class Slots:
+    """
+    Concurrency limit shared by threads and event loops (an asyncio.Semaphore
+    is bound to one loop). Async callers poll for a free slot.
+    """
+
+    def __init__(self, size: int, poll_seconds: float = 0.005):
+        self._semaphore = threading.BoundedSemaphore(size)
+        self.poll_seconds = poll_seconds
+
+    def acquire(self, blocking: bool = True) -> bool:
+        return self._semaphore.acquire(blocking)
+
+    async def aacquire(self):
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(self.poll_seconds)
+
+    def release(self):
+        self._semaphore.release()
+
+class _Attempt:
+    """One request to the API (the original or its hedge)."""
+
+    def __init__(self, hedge: bool):
+        self.hedge = hedge
+        self.stop = threading.Event()
+        self.task = None  # asyncio task, async calls only
+
+class LLMClient:
+    """
+    Wraps chain.stream/invoke (and their async twins) with:
+      - a concurrency cap and a token-bucket rate limit per API key
+      - retries with exponential backoff and full jitter on overload errors;
+        streams are only retried before their first chunk reached the caller
+      - a circuit breaker that fails fast while the API keeps failing
+      - hedging: if the first chunk hasn't arrived after the recent p95
+        latency, a duplicate request is sent (only with spare capacity)
+        and whichever answers first is kept
+    """
+
+    def __init__(self, api_key: str = "", max_concurrency: int = 16, requests_per_minute: float = 0,
+                 burst: int = 10, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 breaker_failures: int = 5, breaker_reset_seconds: float = 30.0, hedging: bool = True,
+                 hedge_percentile: float = 95, hedge_min_delay: float = 0.3, hedge_default_delay: float = 3.0):
+        self.max_concurrency = max_concurrency
+        self.bucket = bucket_for(api_key, requests_per_minute, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        # Time to first chunk of successful calls, kept apart for streams and whole responses
+        self.latency = {"stream": LatencyWindow(), "invoke": LatencyWindow()}
+        self.counts = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                       "failures": 0, "rejected": 0}
+        self._counts_lock = threading.Lock()
+
+        # One limit for sync and async callers together. Sync attempts run on
+        # the pool, one worker per slot, so the caller can wait for two at once.
+        self._slots = Slots(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def _count(self, key: str, amount: int = 1):
+        with self._counts_lock:
+            self.counts[key] += amount
+
+    def hedge_delay(self, kind: str) -> float:
+        p = self.latency[kind].percentile(self.hedge_percentile)
+        return self.hedge_default_delay if p is None else max(self.hedge_min_delay, p)
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform between 0 and the exponential cap."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _after_failure(self, e: Exception, attempt: int) -> float:
+        """Records a failed try. Returns the backoff before the next one, or re-raises."""
+        if not is_retryable(e):
+            self.breaker.record_success()  # the API answered; the request itself was bad
+            self._count("failures")
+            telemetry.llm_calls_total.inc(outcome="error")
+            raise e
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self._count("failures")
+            telemetry.llm_calls_total.inc(outcome="error")
+            raise e
+        delay = self.backoff(attempt)
+        print(f"LLM call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        self._count("retries")
+        telemetry.llm_retries_total.inc()
+        return delay
+
+    def _before_call(self) -> bool:
+        try:
+            return self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected")
+            telemetry.llm_calls_total.inc(outcome="rejected")
+            raise
+
+    def _on_first_chunk(self, attempt: _Attempt, kind: str, started: float):
+        elapsed = time.perf_counter() - started
+        self.breaker.record_success()
+        self.latency[kind].add(elapsed)
+        telemetry.llm_first_chunk_seconds.observe(elapsed, kind=kind)
+        telemetry.llm_calls_total.inc(outcome="ok")
+        if attempt.hedge:
+            self._count("hedge_wins")
+            telemetry.llm_hedges_total.inc(outcome="won")
+
+    # --- sync ---
+    def stream(self, chain, inputs: dict):
+        yield from self._run(lambda: chain.stream(inputs), "stream")
+
+    def invoke(self, chain, inputs: dict):
+        def produce():
+            yield chain.invoke(inputs)
+        for result in self._run(produce, "invoke"):
+            return result
+
+    def _run(self, make_iter, kind: str):
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            trial = self._before_call()
+            try:
+                winner, events, first = self._race(make_iter, kind)
+            except Exception as e:
+                time.sleep(self._after_failure(e, attempt))
+                continue
+            except BaseException:
+                # Interrupted before any outcome (e.g. a Streamlit rerun)
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            try:
+                if first is not _END:
+                    yield first
+                    yield from self._follow(winner, events)
+            finally:
+                winner.stop.set()  # the caller may stop early (e.g. NO_ANSWER)
+            return
+
+    def _start(self, make_iter, events, hedge: bool):
+        # Hedges only use spare capacity: no waiting for a slot or a rate-limit token
+        if hedge:
+            if not self._slots.acquire(blocking=False):
+                return None
+            if self.bucket is not None and not self.bucket.try_acquire():
+                self._slots.release()
+                return None
+        else:
+            self._slots.acquire()
+            if self.bucket is not None:
+                try:
+                    self.bucket.acquire()
+                except BaseException:
+                    self._slots.release()
+                    raise
+        attempt = _Attempt(hedge)
+        self._count("attempts")
+        # Workers keep the caller's context (request ID for spans, LangChain callbacks)
+        self._pool.submit(contextvars.copy_context().run, self._work, attempt, make_iter, events)
+        return attempt
+
+    def _work(self, attempt: _Attempt, make_iter, events):
+        try:
+            iterator = make_iter()
+            try:
+                for chunk in iterator:
+                    events.put((attempt, "chunk", chunk))
+                    if attempt.stop.is_set():
+                        break
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+            events.put((attempt, "end", None))
+        except Exception as e:
+            events.put((attempt, "error", e))
+        finally:
+            self._slots.release()
+
+    def _race(self, make_iter, kind: str):
+        """Waits for the first chunk, hedging once if it is slow. Returns (winner, events, first chunk)."""
+        events = queue.Queue()
+        started = time.perf_counter()
+        attempts = [self._start(make_iter, events, hedge=False)]
+        deadline = started + self.hedge_delay(kind) if self.hedging else None
+        failed = 0
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                try:
+                    attempt, event, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    deadline = None
+                    hedge = self._start(make_iter, events, hedge=True)
+                    if hedge is not None:
+                        attempts.append(hedge)
+                        self._count("hedges")
+                        telemetry.llm_hedges_total.inc(outcome="fired")
+                    continue
+                if event == "error":
+                    failed += 1
+                    if failed == len(attempts):
+                        raise payload
+                    continue
+                for other in attempts:
+                    if other is not attempt:
+                        other.stop.set()
+                self._on_first_chunk(attempt, kind, started)
+                return attempt, events, (payload if event == "chunk" else _END)
+        except BaseException:
+            for attempt in attempts:
+                attempt.stop.set()
+            raise
+
+    @staticmethod
+    def _follow(winner: _Attempt, events):
+        while True:
+            attempt, event, payload = events.get()
+            if attempt is not winner:
+                continue  # the losing request's leftovers
+            if event == "chunk":
+                yield payload
+            elif event == "end":
+                return
+            else:
+                raise payload
+
+    # --- async ---
+    async def astream(self, chain, inputs: dict):
+        async for chunk in self._arun(lambda: chain.astream(inputs), "stream"):
+            yield chunk
+
+    async def ainvoke(self, chain, inputs: dict):
+        async def produce():
+            yield await chain.ainvoke(inputs)
+        async for result in self._arun(produce, "invoke"):
+            return result
+
+    async def _arun(self, make_iter, kind: str):
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            trial = self._before_call()
+            try:
+                winner, events, first = await self._arace(make_iter, kind)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, attempt))
+                continue
+            except BaseException:
+                # Cancelled before any outcome (client disconnect, Streamlit rerun)
+                if trial:
+                    self.breaker.abandon_trial()
+                raise
+            try:
+                if first is not _END:
+                    yield first
+                    while True:
+                        event, payload = await self._anext(winner, events)
+                        if event == "end":
+                            break
+                        yield payload
+            finally:
+                winner.task.cancel()
+            return
+
+    @staticmethod
+    async def _anext(winner: _Attempt, events):
+        while True:
+            attempt, event, payload = await events.get()
+            if attempt is not winner:
+                continue
+            if event == "error":
+                raise payload
+            return event, payload
+
+    async def _astart(self, make_iter, events, hedge: bool):
+        if hedge:
+            if not self._slots.acquire(blocking=False):
+                return None
+            if self.bucket is not None and not self.bucket.try_acquire():
+                self._slots.release()
+                return None
+        else:
+            await self._slots.aacquire()
+            if self.bucket is not None:
+                try:
+                    await self.bucket.aacquire()
+                except BaseException:
+                    self._slots.release()
+                    raise
+        attempt = _Attempt(hedge)
+        self._count("attempts")
+        attempt.task = asyncio.create_task(self._awork(attempt, make_iter, events, self._slots))
+        return attempt
+
+    @staticmethod
+    async def _awork(attempt: _Attempt, make_iter, events, slots: Slots):
+        try:
+            iterator = make_iter()
+            try:
+                async for chunk in iterator:
+                    events.put_nowait((attempt, "chunk", chunk))
+            finally:
+                await iterator.aclose()
+            events.put_nowait((attempt, "end", None))
+        except Exception as e:
+            events.put_nowait((attempt, "error", e))
+        finally:
+            slots.release()
+
+    async def _arace(self, make_iter, kind: str):
+        events = asyncio.Queue()
+        started = time.perf_counter()
+        attempts = [await self._astart(make_iter, events, hedge=False)]
+        deadline = started + self.hedge_delay(kind) if self.hedging else None
+        failed = 0
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                try:
+                    attempt, event, payload = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    deadline = None
+                    hedge = await self._astart(make_iter, events, hedge=True)
+                    if hedge is not None:
+                        attempts.append(hedge)
+                        self._count("hedges")
+                        telemetry.llm_hedges_total.inc(outcome="fired")
+                    continue
+                if event == "error":
+                    failed += 1
+                    if failed == len(attempts):
+                        raise payload
+                    continue
+                for other in attempts:
+                    if other is not attempt:
+                        other.task.cancel()
+                self._on_first_chunk(attempt, kind, started)
+                return attempt, events, (payload if event == "chunk" else _END)
+        except asyncio.CancelledError:
+            for attempt in attempts:
+                attempt.task.cancel()
+            raise
+
+    def stats(self):
+        """Counters plus recent first-chunk latencies, for tuning the settings above."""
+        with self._counts_lock:
+            stats = dict(self.counts)
+        for kind, window in self.latency.items():
+            stats[f"{kind}_p50_ms"] = (window.percentile(50, min_samples=1) or 0.0) * 1000
+            stats[f"{kind}_p95_ms"] = (window.percentile(95, min_samples=1) or 0.0) * 1000
+            stats[f"{kind}_hedge_delay_ms"] = self.hedge_delay(kind) * 1000
+        stats["breaker"] = self.breaker.state
+        return stats
+
+_END = object()  # first event was the end of an empty stream
+
+llm_client = LLMClient(
+    api_key=GOOGLE_API_KEY or "",
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    burst=LLM_BURST,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE_SECONDS,
+    backoff_max=LLM_BACKOFF_MAX_SECONDS,
+    breaker_failures=LLM_BREAKER_FAILURES,
+    breaker_reset_seconds=LLM_BREAKER_RESET_SECONDS,
+    hedging=LLM_HEDGING,
+    hedge_percentile=LLM_HEDGE_PERCENTILE,
+    hedge_min_delay=LLM_HEDGE_MIN_DELAY_MS / 1000,
+    hedge_default_delay=LLM_HEDGE_DEFAULT_DELAY_MS / 1000,
+)
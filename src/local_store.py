@@ -0,0 +1,365 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+class _Namespace:
+    """
+    On-disk storage for one namespace:
+      vectors.f32  - append-only float32 rows, read through np.memmap
+      rows.jsonl   - one line per row: {"id": ..., "metadata": {...}}
+      deleted.txt  - row numbers that have been deleted or overwritten
+      dim          - the vector dimension
+    Once more than `compact_ratio` of the rows (and at least
+    `compact_min_rows`) are dead, the files are rewritten with the live rows
+    only, so re-ingests and deletes don't grow disk use and scans forever.
+    """
+
+    def __init__(self, path: str, compact_ratio: float = 0.5, compact_min_rows: int = 1000):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        self.lock = threading.Lock()
+        self.closed = False  # set by delete_all; writers holding this object must start over
+        self.dim = None
+        self.ids = []
+        self.metadata = []
+        self.live = np.zeros(0, dtype=bool)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.row_of = {}
+        self._matrix = None
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        # A compaction interrupted between its two renames: the new files were complete
+        if not os.path.exists(self.path) and os.path.exists(self.path + _COMPACTING):
+            os.rename(self.path + _COMPACTING, self.path)
+        for leftover in (_COMPACTING, _REPLACED):
+            shutil.rmtree(self.path + leftover, ignore_errors=True)
+        if not os.path.exists(self._file("rows.jsonl")):
+            return
+        with open(self._file("rows.jsonl"), encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        deleted = set()
+        if os.path.exists(self._file("deleted.txt")):
+            with open(self._file("deleted.txt")) as f:
+                deleted = {int(line) for line in f if line.strip()}
+
+        with open(self._file("dim")) as f:
+            self.dim = int(f.read())
+        # A crash between the two appends can leave extra rows on one side
+        n = min(len(rows), os.path.getsize(self._file("vectors.f32")) // 4 // self.dim)
+        rows = rows[:n]
+        self.ids = [r["id"] for r in rows]
+        self.metadata = [r["metadata"] for r in rows]
+        self.live = np.ones(n, dtype=bool)
+        for row in deleted:
+            if row < n:
+                self.live[row] = False
+        self.row_of = {cid: i for i, cid in enumerate(self.ids) if self.live[i]}
+        self.norms = np.linalg.norm(self.matrix(), axis=1) if n else np.zeros(0, dtype=np.float32)
+
+    def matrix(self):
+        n = len(self.ids)
+        if n == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != n:
+            self._matrix = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self._matrix
+
+    def upsert(self, vectors):
+        if not vectors:
+            return
+        # An ID repeated within the batch: the last one wins, like a later upsert would
+        vectors = list({v[0]: v for v in vectors}.values())
+        ids = [v[0] for v in vectors]
+        values = np.asarray([v[1] for v in vectors], dtype=np.float32)
+        if self.dim is None:
+            self.dim = values.shape[1]
+        elif values.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match namespace dimension {self.dim}")
+
+        os.makedirs(self.path, exist_ok=True)
+        if not os.path.exists(self._file("dim")):
+            with open(self._file("dim"), "w") as f:
+                f.write(str(self.dim))
+        replaced = [self.row_of[cid] for cid in ids if cid in self.row_of]
+        start = len(self.ids)
+
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(values.tobytes())
+        with open(self._file("rows.jsonl"), "a", encoding="utf-8") as f:
+            for cid, _, metadata in vectors:
+                f.write(json.dumps({"id": cid, "metadata": metadata}) + "\n")
+        self._mark_deleted(replaced)
+
+        self.ids.extend(ids)
+        self.metadata.extend(v[2] for v in vectors)
+        self.live = np.concatenate([self.live, np.ones(len(ids), dtype=bool)])
+        self.norms = np.concatenate([self.norms, np.linalg.norm(values, axis=1)])
+        for offset, cid in enumerate(ids):
+            self.row_of[cid] = start + offset
+        self._maybe_compact()
+
+    def delete(self, ids):
+        rows = [self.row_of.pop(cid) for cid in ids if cid in self.row_of]
+        self._mark_deleted(rows)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        dead = len(self.ids) - int(self.live.sum())
+        if dead >= self.compact_min_rows and dead > self.compact_ratio * len(self.ids):
+            self.compact()
+
+    def compact(self, block_rows: int = 65536):
+        """
+        Rewrites the namespace with its live rows only. The new files are
+        written to a side directory and swapped in with two renames, which
+        _load() completes if a crash falls between them.
+        """
+        keep = np.flatnonzero(self.live)
+        tmp = self.path + _COMPACTING
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        with open(os.path.join(tmp, "dim"), "w") as f:
+            f.write(str(self.dim))
+        matrix = self.matrix()
+        with open(os.path.join(tmp, "vectors.f32"), "wb") as f:
+            for i in range(0, len(keep), block_rows):
+                f.write(np.ascontiguousarray(matrix[keep[i:i + block_rows]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(os.path.join(tmp, "rows.jsonl"), "w", encoding="utf-8") as f:
+            for row in keep:
+                f.write(json.dumps({"id": self.ids[row], "metadata": self.metadata[row]}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._matrix = None
+        os.rename(self.path, self.path + _REPLACED)
+        os.rename(tmp, self.path)
+        shutil.rmtree(self.path + _REPLACED, ignore_errors=True)
+        print(f"Compacted {self.path}: {len(self.ids) - len(keep)} dead rows dropped, {len(keep)} kept")
+
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.live = np.ones(len(keep), dtype=bool)
+        self.norms = self.norms[keep]
+        self.row_of = {cid: i for i, cid in enumerate(self.ids)}
+
+    def _mark_deleted(self, rows):
+        if not rows:
+            return
+        with open(self._file("deleted.txt"), "a") as f:
+            f.write("".join(f"{r}\n" for r in rows))
+        self.live[rows] = False
+
+    def search(self, query: np.ndarray, k: int):
+        """Vectorized cosine top-k over the live rows. Returns [(row, score)]."""
+        n_live = int(self.live.sum())
+        if n_live == 0:
+            return []
+        scores = self.matrix() @ query
+        scores = scores / (self.norms * np.linalg.norm(query) + 1e-12)
+        scores[~self.live] = -np.inf
+        k = min(k, n_live)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+# Side directories of a compaction; "#" is always escaped in namespace directory names
+_COMPACTING = "#compacting"
+_REPLACED = "#replaced"
+
+class LocalIndex:
+    """
+    In-process stand-in for a Pinecone index, exposing the `upsert` and
+    `delete` calls that src/rag.py makes against the real one.
+    """
+
+    def __init__(self, root: str, compact_ratio: float = 0.5, compact_min_rows: int = 1000):
+        self.root = root
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, namespace: str) -> str:
+        return os.path.join(self.root, quote(namespace or "__default__", safe=""))
+
+    def namespace(self, namespace: str) -> _Namespace:
+        namespace = namespace or ""
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = self._namespaces[namespace] = _Namespace(
+                    self._dir(namespace), self.compact_ratio, self.compact_min_rows
+                )
+        return ns
+
+    @contextmanager
+    def _locked(self, namespace: str):
+        """The namespace with its lock held; starts over if it was deleted while waiting."""
+        while True:
+            ns = self.namespace(namespace)
+            with ns.lock:
+                if not ns.closed:
+                    yield ns
+                    return
+
+    def upsert(self, vectors, namespace: str = None):
+        vectors = list(vectors)
+        with self._locked(namespace) as ns:
+            ns.upsert(vectors)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids=None, delete_all: bool = False, namespace: str = None):
+        if delete_all:
+            # Under the namespace lock too, so no write in flight can touch the files being removed
+            with self._lock:
+                ns = self._namespaces.pop(namespace or "", None)
+                if ns is None:
+                    shutil.rmtree(self._dir(namespace), ignore_errors=True)
+                else:
+                    with ns.lock:
+                        ns.closed = True
+                        shutil.rmtree(self._dir(namespace), ignore_errors=True)
+            return {}
+        with self._locked(namespace) as ns:
+            ns.delete(ids or [])
+        return {}
+
+    def query(self, vector, top_k: int, namespace: str = None,
+              include_values: bool = False, include_metadata: bool = False, **kwargs):
+        """Same shape as a Pinecone query response: {"matches": [{"id", "score", ...}]}."""
+        query = np.asarray(vector, dtype=np.float32)
+        matches = []
+        with self._locked(namespace) as ns:
+            for row, score in ns.search(query, top_k):
+                match = {"id": ns.ids[row], "score": score}
+                if include_values:
+                    match["values"] = ns.matrix()[row].tolist()
+                if include_metadata:
+                    match["metadata"] = dict(ns.metadata[row])
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace: str = None):
+        """Same shape as a Pinecone fetch response: `.vectors[id].metadata`."""
+        vectors = {}
+        with self._locked(namespace) as ns:
+            for cid in ids:
+                row = ns.row_of.get(cid)
+                if row is not None:
+                    vectors[cid] = SimpleNamespace(
+                        id=cid, values=ns.matrix()[row].tolist(), metadata=dict(ns.metadata[row])
+                    )
+        return SimpleNamespace(namespace=namespace or "", vectors=vectors)
+
+    def list_namespaces(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            "" if d == "__default__" else unquote(d) for d in os.listdir(self.root)
+            if _COMPACTING not in d and _REPLACED not in d
+        )
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store backed by LocalIndex: float32 embeddings in memory-mapped
+    files per namespace and brute-force cosine top-k with NumPy. Intended for
+    small per-session namespaces, offline runs and tests.
+    """
+
+    def __init__(self, embedding: Embeddings, root: str, text_key: str = "text",
+                 compact_ratio: float = 0.5, compact_min_rows: int = 1000):
+        self._embedding = embedding
+        self._text_key = text_key
+        self.index = LocalIndex(root, compact_ratio, compact_min_rows)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        embeddings = self._embedding.embed_documents(texts)
+        self.index.upsert(
+            vectors=[
+                (cid, values, {**metadata, self._text_key: text})
+                for cid, values, metadata, text in zip(ids, embeddings, metadatas, texts)
+            ],
+            namespace=namespace,
+        )
+        return ids
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, namespace: Optional[str] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        response = self.index.query(embedding, top_k=k, namespace=namespace, include_metadata=True)
+        results = []
+        for match in response["matches"]:
+            metadata = match["metadata"]
+            text = metadata.pop(self._text_key, "")
+            results.append((Document(id=match["id"], page_content=text, metadata=metadata), match["score"]))
+        return results
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, namespace: Optional[str] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, namespace=namespace
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, namespace: Optional[str] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, namespace=namespace)]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, namespace: Optional[str] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, namespace=namespace)]
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: Optional[str] = None, **kwargs: Any):
+        self.index.delete(ids=ids, delete_all=ids is None, namespace=namespace)
+
+    def _select_relevance_score_fn(self):
+        # Same mapping Pinecone uses for cosine: [-1, 1] -> [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        root: str = ".cache/vectors",
+        namespace: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding=embedding, root=root)
+        store.add_texts(texts, metadatas=metadatas, namespace=namespace)
+        return store
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Set
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """sha256 of the file contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def make_chunk_id(file_hash: str, page, offset) -> str:
+    """Deterministic vector ID: the same file always yields the same IDs."""
+    return f"{file_hash[:32]}#p{page}#o{offset}"
+
+class Manifest:
+    """
+    Local SQLite record of what has been indexed, per namespace.
+
+    `files` maps a source name to the hash of the version last ingested;
+    `chunks` holds the vector IDs already upserted for each file hash.
+    A file is `complete` once every one of its chunks has been uploaded.
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                namespace TEXT NOT NULL,
+                source TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                complete INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, source)
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                namespace TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                PRIMARY KEY (namespace, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS chunks_by_file ON chunks(namespace, file_hash);
+        """)
+        self._conn.commit()
+
+    def get_file_hash(self, namespace: str, source: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_hash FROM files WHERE namespace = ? AND source = ?",
+                (namespace, source),
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_complete(self, namespace: str, file_hash: str) -> bool:
+        """True if some source in the namespace already fully indexed this content."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM files WHERE namespace = ? AND file_hash = ? AND complete = 1 LIMIT 1",
+                (namespace, file_hash),
+            ).fetchone()
+        return row is not None
+
+    def set_file(self, namespace: str, source: str, file_hash: str, complete: bool):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (namespace, source, file_hash, complete, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (namespace, source, file_hash, int(complete), time.time()),
+            )
+            self._conn.commit()
+
+    def chunk_ids(self, namespace: str, file_hash: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE namespace = ? AND file_hash = ?",
+                (namespace, file_hash),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def add_chunks(self, namespace: str, file_hash: str, chunk_ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (namespace, chunk_id, file_hash) VALUES (?, ?, ?)",
+                [(namespace, cid, file_hash) for cid in chunk_ids],
+            )
+            self._conn.commit()
+
+    def is_referenced(self, namespace: str, file_hash: str) -> bool:
+        """True if any source in the namespace still points at this file hash."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM files WHERE namespace = ? AND file_hash = ? LIMIT 1",
+                (namespace, file_hash),
+            ).fetchone()
+        return row is not None
+
+    def forget_file(self, namespace: str, file_hash: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE namespace = ? AND file_hash = ?", (namespace, file_hash)
+            )
+            self._conn.execute(
+                "DELETE FROM files WHERE namespace = ? AND file_hash = ?", (namespace, file_hash)
+            )
+            self._conn.commit()
+
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM files WHERE namespace = ?", (namespace,))
+            self._conn.commit()
@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List
+from src.config import (
+    NAMESPACE_TTL_SECONDS, NAMESPACE_SWEEP_INTERVAL_SECONDS,
+    NAMESPACE_SWEEP_BATCH_SIZE, NAMESPACE_SWEEP_MAX_DELETES_PER_SECOND,
+)
+
+class NamespaceRegistry:
+    """
+    Local SQLite record of every namespace that holds vectors: when it was
+    created, when it was last used, and how many chunks/bytes it holds.
+    Only `ephemeral` namespaces (chat sessions) are ever garbage-collected;
+    anything else, e.g. the bulk-ingested default namespace, is kept.
+    Deleted namespaces leave a tombstone for `tombstone_seconds`, so writes
+    that land after the delete are still collected (see add_usage).
+    """
+
+    def __init__(self, path: str, touch_interval: float = 60.0, tombstone_seconds: float = 7 * 24 * 3600):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.touch_interval = touch_interval
+        self.tombstone_seconds = tombstone_seconds
+        self._lock = threading.Lock()
+        self._last_touch = {}  # namespace -> last time written, so reads don't write on every question
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS namespaces (
+                namespace TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                ephemeral INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS namespaces_by_access ON namespaces(ephemeral, last_access);
+            CREATE TABLE IF NOT EXISTS forgotten (
+                namespace TEXT PRIMARY KEY,
+                forgotten_at REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def _ensure(self, namespace: str, now: float):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO namespaces (namespace, created_at, last_access) VALUES (?, ?, ?)",
+            (namespace, now, now),
+        )
+
+    def register(self, namespace: str, ephemeral: bool = False):
+        """Records a namespace; ephemeral ones are deleted once idle for the TTL."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM forgotten WHERE namespace = ?", (namespace,))
+            self._ensure(namespace, now)
+            self._conn.execute(
+                "UPDATE namespaces SET ephemeral = ?, last_access = ? WHERE namespace = ?",
+                (int(ephemeral), now, namespace),
+            )
+            self._conn.commit()
+            self._last_touch[namespace] = now
+
+    def touch(self, namespace: str):
+        """Marks the namespace as used (written at most once per `touch_interval`)."""
+        now = time.time()
+        with self._lock:
+            if now - self._last_touch.get(namespace, 0.0) < self.touch_interval:
+                return
+            self._last_touch[namespace] = now
+            self._conn.execute("UPDATE namespaces SET last_access = ? WHERE namespace = ?", (now, namespace))
+            self._conn.commit()
+
+    def add_usage(self, namespace: str, chunks: int, size_bytes: int):
+        now = time.time()
+        with self._lock:
+            forgotten = self._conn.execute(
+                "SELECT 1 FROM forgotten WHERE namespace = ?", (namespace,)
+            ).fetchone()
+            if forgotten:
+                # Vectors written after the namespace was deleted (e.g. an ingest job that
+                # outlived End Session): track them as an ephemeral namespace idle since
+                # forever, so the sweeper deletes them again on its next pass
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO namespaces (namespace, created_at, last_access, ephemeral) VALUES (?, ?, 0, 1)",
+                    (namespace, now),
+                )
+                self._conn.execute(
+                    "UPDATE namespaces SET chunks = chunks + ?, bytes = bytes + ? WHERE namespace = ?",
+                    (chunks, size_bytes, namespace),
+                )
+                self._conn.commit()
+                return
+            self._ensure(namespace, now)
+            self._conn.execute(
+                "UPDATE namespaces SET chunks = chunks + ?, bytes = bytes + ?, last_access = ? WHERE namespace = ?",
+                (chunks, size_bytes, now, namespace),
+            )
+            self._conn.commit()
+            self._last_touch[namespace] = now
+
+    def forget(self, namespace: str):
+        """Removes a deleted namespace, leaving a tombstone."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM namespaces WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM forgotten WHERE forgotten_at < ?", (now - self.tombstone_seconds,))
+            self._conn.execute("INSERT OR REPLACE INTO forgotten (namespace, forgotten_at) VALUES (?, ?)", (namespace, now))
+            self._conn.commit()
+            self._last_touch.pop(namespace, None)
+
+    def get(self, namespace: str):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM namespaces WHERE namespace = ?", (namespace,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM namespaces ORDER BY last_access")
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def idle(self, older_than: float, limit: int) -> List[str]:
+        """Ephemeral namespaces not used since the `older_than` timestamp, least recently used first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace FROM namespaces WHERE ephemeral = 1 AND last_access < ?"
+                " ORDER BY last_access LIMIT ?",
+                (older_than, limit),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+class NamespaceSweeper:
+    """
+    Background thread that deletes idle ephemeral namespaces: every
+    `interval_seconds` it takes up to `batch_size` namespaces idle for longer
+    than `ttl_seconds` and deletes them one by one, at most
+    `max_deletes_per_second` (0 = no limit), so a large backlog never
+    floods the index.
+    """
+
+    def __init__(self, registry: NamespaceRegistry, delete_fn, is_busy=None,
+                 ttl_seconds: float = NAMESPACE_TTL_SECONDS,
+                 interval_seconds: float = NAMESPACE_SWEEP_INTERVAL_SECONDS,
+                 batch_size: int = NAMESPACE_SWEEP_BATCH_SIZE,
+                 max_deletes_per_second: float = NAMESPACE_SWEEP_MAX_DELETES_PER_SECOND):
+        if max_deletes_per_second < 0:
+            raise ValueError(f"max_deletes_per_second must be >= 0 (0 = no limit), got {max_deletes_per_second}")
+        self.registry = registry
+        self.delete_fn = delete_fn  # returns True once the namespace is gone
+        self.is_busy = is_busy or (lambda namespace: False)
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_deletes_per_second = max_deletes_per_second
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sweep_once(self, dry_run: bool = False) -> List[str]:
+        """Deletes one batch of idle namespaces. Returns the ones deleted (or that would be)."""
+        candidates = self.registry.idle(time.time() - self.ttl_seconds, self.batch_size)
+        deleted = []
+        for namespace in candidates:
+            if self._stop.is_set():
+                break
+            if self.is_busy(namespace):
+                continue
+            if dry_run:
+                deleted.append(namespace)
+                continue
+            if self.delete_fn(namespace):
+                deleted.append(namespace)
+            # Rate limit, but wake up immediately on stop()
+            if self.max_deletes_per_second:
+                self._stop.wait(1.0 / self.max_deletes_per_second)
+        if deleted and not dry_run:
+            print(f"Namespace sweeper: deleted {len(deleted)} idle namespace(s)")
+        return deleted
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.sweep_once()
+            except Exception as e:
+                print(f"Namespace sweeper error: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="namespace-sweeper")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
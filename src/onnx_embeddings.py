@@ -0,0 +1,87 @@
+import os
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Optional backend: needs `pip install onnxruntime tokenizers`, plus a model
+# exported with export_onnx.py. Nothing here is imported unless
+# EMBEDDING_BACKEND=onnx.
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an exported (optionally int8-quantized) ONNX
+    MiniLM, run with onnxruntime on CPU.
+
+    Reproduces the sentence-transformers pipeline for all-MiniLM-L6-v2
+    (mean pooling over the attention mask, then L2 normalization), so the
+    vectors live in the same 384-dim space as the existing index. Inputs are
+    sorted by token length before batching, so each batch is padded only to
+    its own longest text.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, batch_size: int = 32,
+                 threads: int = 0, max_length: int = 256, dimension: int = None):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx needs onnxruntime and tokenizers: pip install onnxruntime tokenizers"
+            ) from e
+
+        model_file = os.path.join(model_dir, "model_quantized.onnx" if quantized else "model.onnx")
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"{model_file} not found. Export it first: python export_onnx.py --out {model_dir}")
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.no_padding()  # padded per batch in _embed_batch
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        # Hidden size is static in exported MiniLM graphs; fall back to the expected size otherwise
+        output_dim = self.session.get_outputs()[0].shape[-1]
+        self.dimension = output_dim if isinstance(output_dim, int) else dimension
+        if self.dimension is None:
+            raise ValueError(f"Can't tell the output dimension of {model_file}; pass `dimension`")
+        if dimension is not None and self.dimension != dimension:
+            raise ValueError(f"{model_file} produces {self.dimension}-dim vectors, the index expects {dimension}")
+
+    def _embed_batch(self, encodings) -> np.ndarray:
+        width = max(len(e.ids) for e in encodings)
+        input_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), width), dtype=np.int64)
+        for row, e in enumerate(encodings):
+            input_ids[row, :len(e.ids)] = e.ids
+            attention_mask[row, :len(e.ids)] = 1
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then unit length (as sentence-transformers does)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        encodings = self.tokenizer.encode_batch(list(texts))
+        # Shortest first, so every batch has similar lengths and little padding
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            vectors[rows] = self._embed_batch([encodings[i] for i in rows])
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,109 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+def batched(iterable, size: int):
+    """Yields lists of up to `size` items from `iterable`."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def prefetch(iterable, maxsize: int):
+    """
+    Runs `iterable` in a background thread and yields its items through a
+    bounded queue, so the producer works ahead by at most `maxsize` items.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Unblocks the producer if the consumer stopped early
+        stop.set()
+
+class BoundedExecutor:
+    """
+    Thread pool that blocks `submit` once `max_pending` tasks are queued or
+    running, so a fast producer can't pile up unbounded work in memory.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+        self._futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        # Surface failures early instead of only at shutdown
+        pending = []
+        for f in self._futures:
+            if not f.done():
+                pending.append(f)
+            elif f.exception() is not None:
+                raise f.exception()
+        self._futures = pending
+        return future
+
+    def wait(self):
+        """Waits for all submitted tasks and re-raises the first failure."""
+        try:
+            for f in self._futures:
+                f.result()
+        finally:
+            self._futures = []
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
@@ -1,68 +1,536 @@
+import contextvars
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from src.config import PINECONE_INDEX_NAME
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.config import (
+    PINECONE_INDEX_NAME, RETRIEVER_CACHE_SIZE, VECTOR_BACKEND, LOCAL_VECTOR_DIR,
+    LOCAL_VECTOR_COMPACT_RATIO, LOCAL_VECTOR_COMPACT_MIN_ROWS,
+    EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_BACKEND, EMBEDDING_DIMENSION, ONNX_MODEL_DIR, ONNX_QUANTIZED,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS, EMBEDDING_MAX_LENGTH,
+    EMBED_BATCHING, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS,
+    INGEST_EMBED_BATCH_SIZE,
+    INGEST_CHUNK_QUEUE_SIZE, INGEST_UPSERT_QUEUE_SIZE, INGEST_UPSERT_WORKERS,
+    MANIFEST_PATH, RETRIEVAL_CANDIDATES, RERANK_STRATEGY, RERANK_TOP_N, MMR_LAMBDA,
+    LEXICAL_INDEX_PATH, NAMESPACE_REGISTRY_PATH,
+    DOCSTORE_ENABLED, DOCSTORE_PATH, DOCSTORE_COMPRESSION_LEVEL,
+)
+from src.pipeline import batched, prefetch, BoundedExecutor
+from src.embedding_cache import CachedEmbeddings
+from src.embedding_batcher import EmbeddingBatcher
+from src.manifest import Manifest, hash_file
+from src.chunking import iter_chunks
+from src.rerank import mmr
+from src.lexical import BM25Index
+from src.docstore import DocStore
+from src.namespaces import NamespaceRegistry
+from src.answer_cache import answer_cache
+from src import conversation
+from src import telemetry
+from src.telemetry import span
 
-# Initialize Embeddings
-embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# NOTE: the embedding model and the vector store client are created on first
+# use (see get_embedding_function / get_vectorstore), so importing this module
+# stays cheap for scripts that never embed anything.
+embedding_function = None
+_embedding_lock = threading.Lock()
 
-def get_vectorstore():
-    """Returns the base vector store object."""
+def create_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """
+    Builds the raw (uncached) embedding model for `backend`.
+    Returns (model, cache_name); cache_name keeps cached vectors from
+    different backends apart.
+    """
+    if backend == "onnx":
+        from src.onnx_embeddings import OnnxEmbeddings
+        model = OnnxEmbeddings(
+            ONNX_MODEL_DIR,
+            quantized=ONNX_QUANTIZED,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            threads=EMBEDDING_THREADS,
+            max_length=EMBEDDING_MAX_LENGTH,
+            dimension=EMBEDDING_DIMENSION,
+        )
+        return model, f"{EMBEDDING_MODEL_NAME}+onnx{'-int8' if ONNX_QUANTIZED else ''}"
+    if backend != "huggingface":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend!r} (expected 'huggingface' or 'onnx')")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME), EMBEDDING_MODEL_NAME
+
+def get_embedding_function():
+    """
+    Returns the process-wide embedding model, loading it on first call.
+    Embeddings are cached on disk, so re-uploaded documents and repeated
+    questions skip model inference; cache misses for questions from
+    concurrent sessions are embedded together in micro-batches.
+    """
+    global embedding_function
+    if embedding_function is None:
+        with _embedding_lock:
+            if embedding_function is None:
+                start = time.perf_counter()
+                model, cache_name = create_embedding_model()
+                if EMBED_BATCHING:
+                    model = EmbeddingBatcher(model, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS)
+                embedding_function = CachedEmbeddings(
+                    model,
+                    model_name=cache_name,
+                    path=EMBEDDING_CACHE_PATH,
+                    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+                )
+                print(f"Loaded embedding model {cache_name} in {time.perf_counter() - start:.1f}s")
+    return embedding_function
+
+# What has already been indexed, per namespace
+manifest = Manifest(MANIFEST_PATH)
+
+# BM25 index over the same chunks, for hybrid retrieval
+lexical_index = BM25Index(LEXICAL_INDEX_PATH)
+
+# Chunk text and metadata, read back locally after scoring (see DOCSTORE_ENABLED)
+docstore = DocStore(DOCSTORE_PATH, DOCSTORE_COMPRESSION_LEVEL)
+
+# Creation time, last access and size of every namespace (for idle-session cleanup)
+namespace_registry = NamespaceRegistry(NAMESPACE_REGISTRY_PATH)
+
+# Process-wide vector store and per-namespace retriever cache
+_vectorstore = None
+_vectorstore_lock = threading.Lock()
+_retriever_cache = OrderedDict()
+_retriever_lock = threading.Lock()
+_retriever_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "setup_seconds": 0.0,  # total time spent building retrievers on misses
+    "store_setup_seconds": 0.0,  # one-off cost of the shared client/pool
+}
+
+def _create_vectorstore():
+    if VECTOR_BACKEND == "local":
+        from src.local_store import LocalVectorStore
+        return LocalVectorStore(
+            embedding=get_embedding_function(), root=LOCAL_VECTOR_DIR,
+            compact_ratio=LOCAL_VECTOR_COMPACT_RATIO, compact_min_rows=LOCAL_VECTOR_COMPACT_MIN_ROWS,
+        )
+    if VECTOR_BACKEND != "pinecone":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND!r} (expected 'pinecone' or 'local')")
+    from langchain_pinecone import PineconeVectorStore
     return PineconeVectorStore(
         index_name=PINECONE_INDEX_NAME,
-        embedding=embedding_function
+        embedding=get_embedding_function()
     )
 
-def ingest_pdf(file_path: str, namespace: str):  # Added namespace argument
+def get_vectorstore():
+    """
+    Returns the shared vector store object (one pooled client per process).
+    The backend is chosen by VECTOR_BACKEND in src/config.py.
+    """
+    global _vectorstore
+    if _vectorstore is None:
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                start = time.perf_counter()
+                _vectorstore = _create_vectorstore()
+                _retriever_stats["store_setup_seconds"] = time.perf_counter() - start
+    return _vectorstore
+
+def get_index():
+    """Returns the raw index (Pinecone or LocalIndex) behind the shared vector store."""
+    return get_vectorstore().index
+
+def _upsert_batch(vectors, namespace: str):
+    text_key = get_vectorstore()._text_key
+    if DOCSTORE_ENABLED:
+        # Text goes in first, so a chunk is readable as soon as its vector is searchable
+        docstore.put(namespace, [
+            (chunk_id, metadata[text_key], {k: v for k, v in metadata.items() if k != text_key})
+            for chunk_id, _, metadata in vectors
+        ])
+        get_index().upsert(vectors=[(chunk_id, values, {}) for chunk_id, values, _ in vectors], namespace=namespace)
+    else:
+        get_index().upsert(vectors=vectors, namespace=namespace)
+    lexical_index.add(namespace, [(chunk_id, metadata[text_key]) for chunk_id, _, metadata in vectors])
+    # Only record chunks once they are really in the index
+    by_file = {}
+    for chunk_id, _, metadata in vectors:
+        by_file.setdefault(metadata["file_hash"], []).append(chunk_id)
+    for file_hash, chunk_ids in by_file.items():
+        manifest.add_chunks(namespace, file_hash, chunk_ids)
+    size_bytes = sum(len(metadata[text_key].encode()) + 4 * len(values) for _, values, metadata in vectors)
+    namespace_registry.add_usage(namespace, len(vectors), size_bytes)
+    return by_file
+
+def _delete_ids(ids, namespace: str, batch_size: int = 1000):
+    index = get_index()
+    for batch in batched(ids, batch_size):
+        index.delete(ids=batch, namespace=namespace)
+    lexical_index.delete(namespace, ids)
+    docstore.delete(namespace, ids)
+
+def _remove_stale_version(namespace: str, old_hash: str):
+    """Deletes the vectors of a replaced file version, unless another source still uses it."""
+    if manifest.is_referenced(namespace, old_hash):
+        return 0
+    stale = sorted(manifest.chunk_ids(namespace, old_hash))
+    _delete_ids(stale, namespace)
+    manifest.forget_file(namespace, old_hash)
+    # Cached answers may cite the chunks that were just removed
+    answer_cache.invalidate(namespace)
+    return len(stale)
+
+def begin_ingest(file_path: str, namespace: str, source: str, file_hash: str = None):
+    """
+    Checks the manifest before a file is ingested.
+    Returns None if this exact content is already indexed in the namespace,
+    otherwise (file_hash, previous_hash, already_uploaded_ids).
+    """
+    file_hash = file_hash or hash_file(file_path)
+    previous_hash = manifest.get_file_hash(namespace, source)
+
+    if manifest.is_complete(namespace, file_hash):
+        manifest.set_file(namespace, source, file_hash, complete=True)
+        if previous_hash and previous_hash != file_hash:
+            _remove_stale_version(namespace, previous_hash)
+        return None
+
+    manifest.set_file(namespace, source, file_hash, complete=False)
+    return file_hash, previous_hash, manifest.chunk_ids(namespace, file_hash)
+
+def finish_ingest(namespace: str, source: str, file_hash: str, previous_hash: str = None):
+    """Marks a file as fully indexed and removes the version it replaced. Returns the stale count."""
+    manifest.set_file(namespace, source, file_hash, complete=True)
+    # Answers given before these documents arrived may now be wrong
+    answer_cache.invalidate(namespace)
+    if previous_hash and previous_hash != file_hash:
+        return _remove_stale_version(namespace, previous_hash)
+    return 0
+
+def upload_chunks(chunks, namespace: str, on_batch=None):
+    """
+    Embeds (chunk_id, Document) pairs in fixed-size batches and upserts them
+    concurrently. `on_batch({file_hash: chunk_ids})` is called from the
+    upload threads after each batch lands in the index.
+    Returns counters: chunks uploaded and seconds spent embedding.
+    """
+    text_key = get_vectorstore()._text_key
+    stats = {"chunks": 0, "embed_seconds": 0.0}
+
+    def upload(vectors):
+        with span("vector.upsert", chunks=len(vectors)):
+            uploaded = _upsert_batch(vectors, namespace)
+        telemetry.chunks_ingested_total.inc(len(vectors))
+        if on_batch is not None:
+            on_batch(uploaded)
+
+    with BoundedExecutor(INGEST_UPSERT_WORKERS, INGEST_UPSERT_QUEUE_SIZE) as uploads:
+        for batch in batched(chunks, INGEST_EMBED_BATCH_SIZE):
+            start = time.perf_counter()
+            with span("embed.documents", chunks=len(batch)):
+                embeddings = get_embedding_function().embed_documents([d.page_content for _, d in batch])
+            stats["embed_seconds"] += time.perf_counter() - start
+            # We add the namespace argument here to isolate data
+            vectors = [
+                (chunk_id, values, {**d.metadata, text_key: d.page_content})
+                for (chunk_id, d), values in zip(batch, embeddings)
+            ]
+            # Upload threads keep the caller's request ID for their spans
+            uploads.submit(contextvars.copy_context().run, upload, vectors)
+            stats["chunks"] += len(vectors)
+        uploads.wait()
+    return stats
+
+class IngestCancelled(Exception):
+    """Raised inside ingest_pdf when `should_stop()` turns true."""
+
+def _track_pages(chunks, on_page=None, should_stop=None):
+    """Passes chunks through, reporting each finished page and stopping on request."""
+    page = None
+    for chunk_id, doc in chunks:
+        if should_stop is not None and should_stop():
+            raise IngestCancelled("Ingest cancelled")
+        if doc.metadata.get("page") != page:
+            if page is not None and on_page is not None:
+                on_page(page)
+            page = doc.metadata.get("page")
+        yield chunk_id, doc
+    if page is not None and on_page is not None:
+        on_page(page)
+
+def ingest_pdf(file_path: str, namespace: str, source: str = None,  # Added namespace argument
+               on_page=None, on_batch=None, should_stop=None):
     """
     Ingests a PDF into a SPECIFIC namespace (Session ID).
+
+    Runs as a staged pipeline: a background thread parses and splits pages,
+    the calling thread embeds fixed-size batches, and upserts are sent
+    concurrently. Each stage is bounded by a queue (see src/config.py), so
+    memory stays flat regardless of the document size.
+
+    Chunk IDs are derived from the file hash, page and offset and recorded in
+    the local manifest, so ingesting the same content again is a no-op, an
+    interrupted ingest only uploads what is missing, and a changed file
+    replaces its previous version. `source` names the document (defaults to
+    the file name) and is what identifies "the same file" across versions.
+
+    Optional hooks for background jobs: `on_page(page)` after a page is
+    parsed, `on_batch({file_hash: chunk_ids})` after chunks become
+    searchable, and `should_stop()` to cancel (raises IngestCancelled; the
+    chunks already uploaded stay indexed and a later run resumes from them).
     """
+    source = source or os.path.basename(file_path)
     print(f"Processing {file_path} into namespace: {namespace}...")
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
-    
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=300)
-    splits = text_splitter.split_documents(docs)
-    
-    print(f"Uploading {len(splits)} chunks...")
-    
-    # We add the namespace argument here to isolate data
-    vector_store = get_vectorstore()
-    vector_store.add_documents(documents=splits, namespace=namespace)
-    
-    print("Success!")
+
+    plan = begin_ingest(file_path, namespace, source)
+    if plan is None:
+        print(f"{source} is already indexed, nothing to upload.")
+        return True
+    file_hash, previous_hash, already_uploaded = plan
+
+    new_chunks = (
+        c for c in _track_pages(iter_chunks(file_path, file_hash), on_page, should_stop)
+        if c[0] not in already_uploaded
+    )
+    # Parsing runs ahead of embedding by at most INGEST_CHUNK_QUEUE_SIZE batches
+    parsed = prefetch(new_chunks, maxsize=INGEST_CHUNK_QUEUE_SIZE * INGEST_EMBED_BATCH_SIZE)
+    with span("ingest.pdf", source=source) as attrs:
+        stats = upload_chunks(parsed, namespace, on_batch=on_batch)
+        removed = finish_ingest(namespace, source, file_hash, previous_hash)
+        attrs["chunks"] = stats["chunks"]
+
+    print(f"Uploaded {stats['chunks']} chunks ({len(already_uploaded)} already indexed, {removed} stale removed). Success!")
     return True
 
+class TwoStageRetriever(BaseRetriever):
+    """
+    Stage 1: wide, cheap recall of `k` candidates (with their embeddings)
+    from the vector index. Stage 2: local MMR re-ranking over those
+    embeddings down to `top_n`. Each returned document carries its
+    similarity in metadata["score"].
+    """
+
+    namespace: str
+    k: int = RETRIEVAL_CANDIDATES
+    top_n: int = RERANK_TOP_N
+    strategy: str = RERANK_STRATEGY
+    lambda_mult: float = MMR_LAMBDA
+
+    def retrieve(self, query: str, query_vector: List[float] = None):
+        """Returns (documents, per-stage timings/counters)."""
+        stats = {}
+        if query_vector is None:
+            start = time.perf_counter()
+            with span("embed.query"):
+                query_vector = get_embedding_function().embed_query(query)
+            stats["embed_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        use_mmr = self.strategy == "mmr"
+        with span("vector.query"):
+            response = get_index().query(
+                vector=query_vector,
+                top_k=self.k,
+                namespace=self.namespace,  # Restricts search to this session
+                include_values=use_mmr,
+                include_metadata=not DOCSTORE_ENABLED,  # text is loaded below, for the selected chunks only
+            )
+        matches = list(response["matches"])
+        stats["recall_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        if use_mmr and matches:
+            candidates = np.asarray([m["values"] for m in matches], dtype=np.float32)
+            order = mmr(np.asarray(query_vector, dtype=np.float32), candidates, self.top_n, self.lambda_mult)
+        else:
+            order = range(min(self.top_n, len(matches)))
+        selected = [matches[i] for i in order]
+        stats["rerank_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        if DOCSTORE_ENABLED:
+            loaded = load_documents(self.namespace, [m["id"] for m in selected])
+            docs = [self._to_document(m, loaded[m["id"]]) for m in selected if m["id"] in loaded]
+        else:
+            docs = [self._to_document(m) for m in selected]
+        stats["load_ms"] = (time.perf_counter() - start) * 1000
+        stats["candidates"] = len(matches)
+        stats["selected"] = len(docs)
+        return docs, stats
+
+    @staticmethod
+    def _to_document(match, loaded: Document = None) -> Document:
+        if loaded is not None:
+            return Document(id=match["id"], page_content=loaded.page_content,
+                            metadata={**loaded.metadata, "score": match["score"]})
+        metadata = dict(match.get("metadata") or {})
+        text = metadata.pop(get_vectorstore()._text_key, "")
+        metadata["score"] = match["score"]
+        return Document(id=match["id"], page_content=text, metadata=metadata)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.retrieve(query)[0]
+
+def lexical_search(namespace: str, query: str, k: int):
+    """BM25 search over the namespace's chunks. Returns [(chunk_id, score)]."""
+    with span("lexical.search"):
+        return lexical_index.search(namespace, query, k)
+
+def load_documents(namespace: str, ids: List[str]) -> Dict[str, Document]:
+    """
+    Text and metadata for chunk IDs, in one bulk read from the docstore.
+    Chunks that aren't there (upserted with their text before the docstore
+    existed, or with DOCSTORE_ENABLED=false) are fetched from the index.
+    """
+    found = {}
+    if DOCSTORE_ENABLED:
+        with span("docstore.get", ids=len(ids)):
+            for chunk_id, (text, metadata) in docstore.get_many(namespace, ids).items():
+                found[chunk_id] = Document(id=chunk_id, page_content=text, metadata=metadata)
+    missing = [i for i in ids if i not in found]
+    if missing:
+        text_key = get_vectorstore()._text_key
+        with span("vector.fetch", ids=len(missing)):
+            response = get_index().fetch(ids=missing, namespace=namespace)
+        for chunk_id, vector in response.vectors.items():
+            metadata = dict(vector.metadata or {})
+            text = metadata.pop(text_key, "")
+            found[chunk_id] = Document(id=chunk_id, page_content=text, metadata=metadata)
+    return found
+
+def get_documents(namespace: str, ids: List[str], known: List[Document] = ()) -> List[Document]:
+    """
+    Returns documents for `ids` in the same order, reusing `known` ones and
+    loading only the rest.
+    """
+    by_id = {d.id: d for d in known}
+    missing = [i for i in ids if i not in by_id]
+    if missing:
+        by_id.update(load_documents(namespace, missing))
+    return [by_id[i] for i in ids if i in by_id]
+
 def get_retriever(namespace: str):
     """
     Returns a retriever that ONLY looks in the given namespace.
+    Retrievers are cached per namespace (LRU, bounded by RETRIEVER_CACHE_SIZE).
     """
-    vector_store = get_vectorstore()
-    return vector_store.as_retriever(
-        search_kwargs={
-            "k": 50,
-            "namespace": namespace  # Restricts search to this session
-        }
+    namespace_registry.touch(namespace)
+    with _retriever_lock:
+        retriever = _retriever_cache.get(namespace)
+        if retriever is not None:
+            _retriever_cache.move_to_end(namespace)
+            _retriever_stats["hits"] += 1
+            return retriever
+
+    get_vectorstore()
+    start = time.perf_counter()
+    retriever = TwoStageRetriever(namespace=namespace)
+    elapsed = time.perf_counter() - start
+
+    with _retriever_lock:
+        _retriever_stats["misses"] += 1
+        _retriever_stats["setup_seconds"] += elapsed
+        _retriever_cache[namespace] = retriever
+        _retriever_cache.move_to_end(namespace)
+        while len(_retriever_cache) > RETRIEVER_CACHE_SIZE:
+            _retriever_cache.popitem(last=False)
+            _retriever_stats["evictions"] += 1
+    return retriever
+
+def invalidate_retriever(namespace: str = None):
+    """Drops the cached retriever for a namespace (or all of them)."""
+    with _retriever_lock:
+        if namespace is None:
+            _retriever_cache.clear()
+        else:
+            _retriever_cache.pop(namespace, None)
+
+def get_retriever_stats():
+    """
+    Returns cache counters for get_retriever, including the estimated setup
+    time saved compared to building a new store + retriever on every call.
+    """
+    with _retriever_lock:
+        stats = dict(_retriever_stats)
+        stats["cached"] = len(_retriever_cache)
+    calls = stats["hits"] + stats["misses"]
+    avg_setup = stats["setup_seconds"] / stats["misses"] if stats["misses"] else 0.0
+    stats["avg_setup_seconds"] = avg_setup
+    stats["saved_seconds"] = (
+        avg_setup * stats["hits"]
+        + stats["store_setup_seconds"] * max(calls - 1, 0)
     )
+    return stats
+
+def get_embedding_cache_stats():
+    """Hit/miss counters of the embedding cache (zeros until the model is first used)."""
+    if embedding_function is None:
+        return {"hits": 0, "misses": 0, "hit_rate": 0.0, "entries": 0}
+    return embedding_function.stats()
+
+# Exported on /metrics next to the counters in src/telemetry.py
+telemetry.registry.callback(
+    "chatdoc_retriever_cache_hits_total", "get_retriever calls served from the cache.",
+    lambda: get_retriever_stats()["hits"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_retriever_cache_misses_total", "get_retriever calls that built a new retriever.",
+    lambda: get_retriever_stats()["misses"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_retriever_cache_evictions_total", "Retrievers evicted from the cache.",
+    lambda: get_retriever_stats()["evictions"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_retriever_cache_saved_seconds_total", "Estimated setup time saved by the retriever cache.",
+    lambda: get_retriever_stats()["saved_seconds"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_embedding_cache_hits_total", "Texts whose embedding came from the cache.",
+    lambda: get_embedding_cache_stats()["hits"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_embedding_cache_misses_total", "Texts that had to be embedded by the model.",
+    lambda: get_embedding_cache_stats()["misses"], kind="counter",
+)
+telemetry.registry.callback(
+    "chatdoc_embedding_cache_entries", "Embeddings stored in the cache.",
+    lambda: get_embedding_cache_stats()["entries"],
+)
 
 def delete_namespace(namespace: str):
     """
     Deletes all vectors in a specific namespace (Session ID).
     """
-    from pinecone import Pinecone
-    from src.config import PINECONE_API_KEY, PINECONE_INDEX_NAME
-    
-    # We connect directly to the index for this operation
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(PINECONE_INDEX_NAME)
-    
+    # Cached retrievers, answers and local indexes must not outlive the data
+    invalidate_retriever(namespace)
+    manifest.delete_namespace(namespace)
+    lexical_index.delete_namespace(namespace)
+    docstore.delete_namespace(namespace)
+    answer_cache.invalidate(namespace)
+    conversation.delete_thread(namespace)  # the session's chat history
+
     try:
         print(f"🧹 Deleting namespace: {namespace}")
-        index.delete(delete_all=True, namespace=namespace)
+        with span("vector.delete_namespace"):
+            get_index().delete(delete_all=True, namespace=namespace)
+        namespace_registry.forget(namespace)
         print("Namespace deleted.")
         return True
     except Exception as e:
         print(f"Error deleting namespace: {e}")
         return False
+
+def list_index_namespaces():
+    """Namespaces that actually hold vectors in the index (Pinecone or local)."""
+    index = get_index()
+    if VECTOR_BACKEND == "local":
+        return index.list_namespaces()
+    return sorted(index.describe_index_stats().namespaces.keys())
@@ -0,0 +1,66 @@
+from typing import List
+import numpy as np
+from langchain_core.documents import Document
+
+def mmr(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.7) -> List[int]:
+    """
+    Maximal marginal relevance over already-fetched candidate embeddings.
+    Returns the indices of up to `k` candidates, balancing similarity to the
+    query against redundancy with what has already been picked.
+    """
+    if len(candidates) == 0 or k <= 0:
+        return []
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True) + 1e-12
+    unit = candidates / norms
+    q = query / (np.linalg.norm(query) + 1e-12)
+    relevance = unit @ q
+    pairwise = unit @ unit.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = pairwise[selected[0]].copy()
+    k = min(k, len(candidates))
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+def pack_context(docs: List[Document], token_budget: int) -> List[Document]:
+    """
+    Keeps documents in rank order until the token budget is spent.
+    The top document is always kept (truncated if it alone exceeds the budget).
+    """
+    packed = []
+    used = 0
+    for doc in docs:
+        cost = estimate_tokens(doc.page_content)
+        if used + cost > token_budget:
+            if not packed:
+                packed.append(Document(
+                    id=doc.id,
+                    page_content=doc.page_content[:token_budget * 4],
+                    metadata=doc.metadata,
+                ))
+                used = token_budget  # the truncated top document fills the whole budget
+            continue
+        packed.append(doc)
+        used += cost
+    return packed
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60):
+    """
+    Fuses several ranked ID lists: score(id) = sum of 1 / (k + rank).
+    Returns [(id, score)] best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,259 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.config import TRACE_LOG_PATH
+
+# Lightweight in-process metrics and spans, exposed in the Prometheus text
+# format. Recording a span costs a couple of perf_counter calls and one
+# short lock, so it stays on in production.
+
+request_id_var = ContextVar("request_id", default=None)
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def _label_key(labels: dict, names):
+    return tuple(str(labels.get(n, "")) for n in names)
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels, self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels, self.labels), 0.0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labels:
+            items = [((), 0.0)]
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labels, key)} {value:g}"
+
+_INF_LABEL = 'le="+Inf"'
+
+class Histogram:
+    # Seconds, from cache lookups (~1ms) up to slow LLM answers
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels, self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%g"' % bound
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labels, key, _INF_LABEL)} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]:g}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}"
+
+class CallbackMetric:
+    """A counter or gauge read from `fn()` at scrape time, for components that keep their own stats."""
+
+    def __init__(self, name: str, help: str, fn, kind: str = "gauge"):
+        self.name, self.help, self.fn, self.kind = name, help, fn, kind
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {float(self.fn()):g}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels=(), **kwargs) -> Histogram:
+        metric = Histogram(name, help, labels, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name: str, help: str, fn, kind: str = "gauge") -> CallbackMetric:
+        metric = CallbackMetric(name, help, fn, kind)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "chatdoc_stage_seconds", "Latency of graph nodes and external calls.", labels=("stage",)
+)
+stage_errors = registry.counter("chatdoc_stage_errors_total", "Spans that raised.", labels=("stage",))
+requests_total = registry.counter(
+    "chatdoc_requests_total", "Answered questions by where the answer came from.", labels=("answer_source",)
+)
+request_seconds = registry.histogram("chatdoc_request_seconds", "End-to-end latency per question.")
+routes_total = registry.counter("chatdoc_routes_total", "Routing decisions after retrieval.", labels=("route",))
+doc_fallbacks_total = registry.counter(
+    "chatdoc_doc_fallbacks_total", "Document answers that fell back to web search (NO_ANSWER)."
+)
+chunks_retrieved_total = registry.counter("chatdoc_chunks_retrieved_total", "Chunks placed in the LLM context.")
+prompt_chars_total = registry.counter("chatdoc_prompt_chars_total", "Characters sent to the LLM as context + question.")
+chunks_ingested_total = registry.counter("chatdoc_chunks_ingested_total", "Chunks embedded and upserted.")
+llm_calls_total = registry.counter("chatdoc_llm_calls_total", "LLM calls by outcome.", labels=("outcome",))
+llm_retries_total = registry.counter("chatdoc_llm_retries_total", "LLM calls retried after an overload error.")
+llm_hedges_total = registry.counter(
+    "chatdoc_llm_hedges_total", "Hedged duplicate LLM requests (fired, and won the race).", labels=("outcome",)
+)
+llm_breaker_opens_total = registry.counter("chatdoc_llm_breaker_opens_total", "Times the LLM circuit breaker opened.")
+llm_first_chunk_seconds = registry.histogram(
+    "chatdoc_llm_first_chunk_seconds", "Time to the first token (streams) or the response (invoke).", labels=("kind",)
+)
+embed_batch_size = registry.histogram(
+    "chatdoc_embed_batch_size", "Queries per batched embedding call.", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+embed_queue_seconds = registry.histogram(
+    "chatdoc_embed_queue_seconds", "Time a query waited before its embedding batch started."
+)
+
+# Optional JSON-lines trace log: one line per span, tagged with the request ID
+_trace_lock = threading.Lock()
+_trace_file = None
+
+def _write_trace(record: dict):
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is None:
+            if os.path.dirname(TRACE_LOG_PATH):
+                os.makedirs(os.path.dirname(TRACE_LOG_PATH), exist_ok=True)
+            _trace_file = open(TRACE_LOG_PATH, "a", encoding="utf-8", buffering=1)
+        _trace_file.write(json.dumps(record) + "\n")
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times a block as stage `name`; the request ID comes from the current context."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs  # callers may add attributes while the span is open
+    except BaseException as e:
+        error = type(e).__name__
+        stage_errors.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+        if TRACE_LOG_PATH:
+            record = {
+                "request_id": request_id_var.get(),
+                "span": name,
+                "ms": round(elapsed * 1000, 3),
+                "ts": time.time() - elapsed,
+                **attrs,
+            }
+            if error:
+                record["error"] = error
+            _write_trace(record)
+
+@contextmanager
+def request(request_id: str = None):
+    """Makes `request_id` (or a new one) the current request for spans in this block."""
+    token = request_id_var.set(request_id or new_request_id())
+    try:
+        yield request_id_var.get()
+    finally:
+        request_id_var.reset(token)
+
+def traced_node(name: str, fn):
+    """
+    Wraps a graph node (sync or async): runs it under the state's request ID
+    (creating one on the first node) and records a `node.<name>` span.
+    """
+    def finish(result, state, request_id):
+        if isinstance(result, dict) and not state.get("request_id"):
+            result = {**result, "request_id": request_id}
+        return result
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state):
+            with request(state.get("request_id")) as request_id, span(f"node.{name}"):
+                result = await fn(state)
+            return finish(result, state, request_id)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        with request(state.get("request_id")) as request_id, span(f"node.{name}"):
+            result = fn(state)
+        return finish(result, state, request_id)
+    return wrapper
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # scrapes would otherwise flood stderr
+
+_server = None
+
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """Serves GET /metrics on a daemon thread. Safe to call more than once."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+        print(f"Metrics at http://{host}:{port}/metrics")
+    return _server
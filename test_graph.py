@@ -1,5 +1,5 @@
-from langchain_core.messages import HumanMessage
-from src.graph import app
+from src.graph import app, turn_input
+from src.conversation import thread_config
 
 def test_chatbot():
     print("Initializing Chatbot Test...\n")
@@ -8,16 +8,14 @@ def test_chatbot():
     # (Ensure you have uploaded a PDF in the previous step so Pinecone isn't empty!)
     user_input = "What is the main topic of the uploaded document?"
     
-    inputs = {
-        "messages": [HumanMessage(content=user_input)]
-    }
+    inputs = turn_input(user_input, "")  # ingest.py uploads into the default namespace
     
     # 2. Run the graph
     print(f"User: {user_input}")
     print("Thinking...", end="", flush=True)
     
     # app.invoke runs the whole flow from START to END
-    result = app.invoke(inputs)
+    result = app.invoke(inputs, config=thread_config("test-graph"))
     
     # 3. Extract output
     bot_response = result["messages"][-1].content
@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+import tempfile
+import pytest
+
+# Offline tests: no Pinecone, Gemini or model downloads. src.* reads its
+# settings at import, so every store is pointed at a scratch directory
+# (the same local backends bench_pipeline.py uses) before any test imports it.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipeline import configure_environment  # noqa: E402
+
+configure_environment(tempfile.mkdtemp(prefix="chatdoc-tests-"), argparse.Namespace(answer_cache=False))
+
+@pytest.fixture
+def embeddings(monkeypatch, tmp_path):
+    """Hashing stand-in for the embedding model, behind a fresh embedding cache."""
+    from bench_pipeline import HashingEmbeddings
+    from src import rag
+    from src.embedding_cache import CachedEmbeddings
+
+    cached = CachedEmbeddings(HashingEmbeddings(), model_name="test-hashing", path=str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(rag, "embedding_function", cached)
+    return cached
@@ -0,0 +1,119 @@
+import uuid
+from typing import Any
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from bench_pipeline import FakeSearch
+
+class EchoChatModel(BaseChatModel):
+    """Answers every prompt with the question it was asked (the last human message)."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-echo"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"Answer: {messages[-1].content}"))])
+
+@pytest.fixture
+def graph(monkeypatch, embeddings):
+    from src import graph
+
+    monkeypatch.setattr(graph, "llm", EchoChatModel())
+    monkeypatch.setattr(graph, "search_tool", FakeSearch(latency_ms=0))
+    return graph
+
+def ask(graph, session_id: str, question: str) -> dict:
+    from src.conversation import thread_config
+    return graph.app.invoke(graph.turn_input(question, session_id), config=thread_config(session_id))
+
+QUESTIONS = [
+    "What does the report say about revenue growth in Europe?",
+    "How many employees did it hire last year?",
+    "And what about them?",
+]
+
+def assert_answers_each_question(graph, session_id: str):
+    for question in QUESTIONS:
+        result = ask(graph, session_id, question)
+        assert result["query"] == question
+        assert result["messages"][-1].content == f"Answer: {question}"
+
+def test_condense_off_answers_the_new_question(graph, monkeypatch):
+    monkeypatch.setattr(graph, "CONDENSE_QUERY", False)
+    assert_answers_each_question(graph, f"test-{uuid.uuid4().hex}")
+
+def test_condense_failure_answers_the_new_question(graph, monkeypatch):
+    from src.llm_client import CircuitOpenError
+
+    def unavailable(*args, **kwargs):
+        raise CircuitOpenError("The LLM API is overloaded; trying again in 5s.")
+
+    monkeypatch.setattr(graph.llm_client, "invoke", unavailable)
+    assert_answers_each_question(graph, f"test-{uuid.uuid4().hex}")
+
+def test_turn_input_resets_per_turn_state(graph):
+    session_id = f"test-{uuid.uuid4().hex}"
+    ask(graph, session_id, QUESTIONS[0])
+    inputs = graph.turn_input(QUESTIONS[1], session_id)
+    assert inputs["query"] == "" and inputs["context"] == "" and inputs["route"] == ""
+    assert inputs["scores"] == [] and inputs["query_embedding"] == []
+    assert inputs["metrics"] == {"new_turn": True}
+
+def test_needs_condensing():
+    from src.conversation import needs_condensing
+    assert needs_condensing("How many employees did it hire last year?")
+    assert needs_condensing("And the second one?")
+    assert needs_condensing("Why?")
+    assert not needs_condensing("What does the report say about revenue growth in Europe?")
+
+def test_standalone_follow_up_skips_condense(graph, monkeypatch):
+    calls = []
+    invoke = graph.llm_client.invoke
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return invoke(*args, **kwargs)
+
+    monkeypatch.setattr(graph.llm_client, "invoke", counting)
+    session_id = f"test-{uuid.uuid4().hex}"
+    ask(graph, session_id, QUESTIONS[0])
+    ask(graph, session_id, "Which regions reported falling revenue in the annual report?")
+    assert calls == []
+    ask(graph, session_id, QUESTIONS[1])
+    assert len(calls) == 1
+
+def test_compaction_runs_after_the_turn(graph, monkeypatch):
+    from src import conversation
+    monkeypatch.setattr(conversation, "HISTORY_MAX_MESSAGES", 4)
+    session_id = f"test-{uuid.uuid4().hex}"
+    for i in range(3):
+        result = ask(graph, session_id, f"{QUESTIONS[0]} Part {i}.")
+    assert len(result["messages"]) == 6  # the turns themselves never compact
+    graph.compact_later(session_id).result()
+    state = graph.app.get_state(conversation.thread_config(session_id)).values
+    assert len(state["messages"]) <= 4
+    assert state["summary"]
+
+def test_checkpoints_stay_bounded_per_thread(graph):
+    from src import conversation
+    saver = graph.app.checkpointer
+    assert isinstance(saver, conversation.PrunedInMemorySaver)
+    session_id = f"test-{uuid.uuid4().hex}"
+
+    def thread_blobs():
+        return sum(1 for key in saver.blobs if key[0] == session_id)
+
+    for i in range(2):
+        ask(graph, session_id, f"{QUESTIONS[0]} Part {i}.")
+    checkpoints, blobs = len(saver.storage[session_id][""]), thread_blobs()
+    for i in range(2, 8):
+        result = ask(graph, session_id, f"{QUESTIONS[0]} Part {i}.")
+    assert len(saver.storage[session_id][""]) == checkpoints <= saver.keep_last
+    assert thread_blobs() <= blobs + 2  # the growing message list, not one copy per step
+    assert len(result["messages"]) == 16  # history itself survives the pruning
+    assert not [key for key in saver.writes if key[0] == session_id and key[2] not in saver.storage[session_id][""]]
+
+    conversation.delete_thread(session_id)
+    assert session_id not in saver.storage and thread_blobs() == 0
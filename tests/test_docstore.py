@@ -0,0 +1,31 @@
+import uuid
+from src.docstore import DocStore
+
+def test_round_trip_replace_and_delete(tmp_path):
+    store = DocStore(str(tmp_path / "docstore.sqlite3"))
+    text = "Revenue in Europe grew by 12 percent. " * 50
+    store.put("ns", [("c1", text, {"page": 1}), ("c2", "Short.", {"page": 2})])
+    store.put("other", [("c1", "Other session.", {})])
+    assert store.get_many("ns", ["c1", "c2", "missing"]) == {"c1": (text, {"page": 1}), "c2": ("Short.", {"page": 2})}
+    assert store.stats("ns")["compressed_bytes"] < len(text)
+
+    store.put("ns", [("c2", "Replaced.", {"page": 3})])
+    store.delete("ns", ["c1"])
+    assert store.get_many("ns", ["c1", "c2"]) == {"c2": ("Replaced.", {"page": 3})}
+    store.delete_namespace("ns")
+    assert store.stats("ns")["chunks"] == 0
+    assert store.get_many("other", ["c1"]) == {"c1": ("Other session.", {})}
+
+def test_vectors_are_upserted_by_id_only(embeddings):
+    from src import rag
+    namespace = f"test-{uuid.uuid4().hex}"
+    text_key = rag.get_vectorstore()._text_key
+    text = "Employees were hired in Europe and in Asia."
+    vectors = [("chunk-1", embeddings.embed_query(text), {text_key: text, "file_hash": "f1", "page": 4})]
+    rag._upsert_batch(vectors, namespace)
+
+    stored = rag.get_index().fetch(ids=["chunk-1"], namespace=namespace).vectors["chunk-1"]
+    assert not stored.metadata  # no text or metadata in the vector index
+    document = rag.load_documents(namespace, ["chunk-1"])["chunk-1"]
+    assert (document.page_content, document.metadata) == (text, {"file_hash": "f1", "page": 4})
+    rag.delete_namespace(namespace)
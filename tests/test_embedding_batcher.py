@@ -0,0 +1,47 @@
+import threading
+import pytest
+from langchain_core.embeddings import Embeddings
+from src.embedding_batcher import EmbeddingBatcher
+
+class GatedEmbeddings(Embeddings):
+    """Records each forward pass; the first one waits until `gate` is set."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        self.started.set()
+        if len(self.calls) == 1:
+            self.gate.wait(5)
+        if "fail" in texts:
+            raise RuntimeError("model failed")
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_concurrent_queries_share_a_forward_pass():
+    model = GatedEmbeddings()
+    batcher = EmbeddingBatcher(model, max_batch_size=32, max_wait_ms=5)
+    first = batcher.submit("warm")
+    assert model.started.wait(5)
+    # These queue up behind the running pass and go out together
+    texts = ["a", "bb", "ccc", "bb"]
+    futures = [batcher.submit(t) for t in texts]
+    model.gate.set()
+    assert first.result(5) == [4.0, 1.0]
+    assert [f.result(5) for f in futures] == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0], [2.0, 1.0]]
+    assert model.calls == [["warm"], ["a", "bb", "ccc"]]  # the duplicate shares a row
+    stats = batcher.stats()
+    assert (stats["queries"], stats["batches"]) == (5, 2)
+
+def test_model_errors_reach_every_waiting_query():
+    model = GatedEmbeddings()
+    model.gate.set()
+    batcher = EmbeddingBatcher(model, max_batch_size=32, max_wait_ms=5)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.embed_query("fail")
+    assert batcher.embed_query("ok") == [2.0, 1.0]  # the dispatcher keeps running
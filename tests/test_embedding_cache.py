@@ -0,0 +1,22 @@
+from bench_pipeline import HashingEmbeddings
+from src.embedding_cache import CachedEmbeddings
+
+def test_cache_hits_and_lru_cap(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = CachedEmbeddings(HashingEmbeddings(), model_name="test-hashing", path=path, max_entries=3)
+    first = cache.embed_documents(["alpha", "beta", "alpha"])
+    assert first[0] == first[2]
+    assert cache.embed_query("  alpha ") == first[0]  # normalized to the same key
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+    cache.embed_documents(["gamma", "delta", "epsilon"])
+    assert cache.stats()["entries"] == 3
+    (rows,) = cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert rows == 3
+
+    # The running count is picked up again when the file is reopened
+    reopened = CachedEmbeddings(HashingEmbeddings(), model_name="test-hashing", path=path, max_entries=3)
+    assert reopened.stats()["entries"] == 3
+    reopened.embed_query("gamma")
+    stats = reopened.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 0, 3)
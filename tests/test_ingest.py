@@ -0,0 +1,83 @@
+import uuid
+import pytest
+from bench_pipeline import write_pdf
+from src import rag
+
+PAGES = ["alpha beta gamma delta " * 40, "epsilon zeta eta theta " * 40]
+
+@pytest.fixture
+def uploads(monkeypatch, embeddings):
+    """Chunk counts of every upload_chunks call made by ingest_pdf."""
+    counts = []
+    upload_chunks = rag.upload_chunks
+
+    def counting(chunks, namespace, on_batch=None):
+        stats = upload_chunks(chunks, namespace, on_batch=on_batch)
+        counts.append(stats["chunks"])
+        return stats
+
+    monkeypatch.setattr(rag, "upload_chunks", counting)
+    return counts
+
+def live_ids(namespace: str):
+    return set(rag.get_index().namespace(namespace).row_of)
+
+def test_same_content_is_not_uploaded_again(tmp_path, uploads):
+    namespace = f"test-{uuid.uuid4().hex}"
+    path = str(tmp_path / "doc.pdf")
+    write_pdf(path, PAGES)
+    rag.ingest_pdf(path, namespace)
+    first = live_ids(namespace)
+    assert first and uploads == [len(first)]
+
+    rag.ingest_pdf(path, namespace)                      # same file again
+    rag.ingest_pdf(path, namespace, source="copy.pdf")   # same bytes under another name
+    assert uploads == [len(first)]
+    assert live_ids(namespace) == first
+    file_hash = rag.hash_file(path)
+    assert rag.manifest.is_complete(namespace, file_hash)
+    assert rag.manifest.chunk_ids(namespace, file_hash) == first
+
+def test_new_version_replaces_the_stale_one(tmp_path, uploads):
+    namespace = f"test-{uuid.uuid4().hex}"
+    path = str(tmp_path / "doc.pdf")
+    write_pdf(path, PAGES)
+    rag.ingest_pdf(path, namespace)
+    old_hash, old_ids = rag.hash_file(path), live_ids(namespace)
+
+    write_pdf(path, PAGES + ["iota kappa lambda mu " * 40])
+    rag.ingest_pdf(path, namespace)
+    new_hash, new_ids = rag.hash_file(path), live_ids(namespace)
+    assert new_ids and not new_ids & old_ids
+    assert rag.manifest.get_file_hash(namespace, "doc.pdf") == new_hash
+    assert rag.manifest.chunk_ids(namespace, old_hash) == set()
+    hits = rag.lexical_search(namespace, "alpha", 50)
+    assert hits and {cid for cid, _ in hits} <= new_ids
+
+def test_stale_version_kept_while_another_source_uses_it(tmp_path, uploads):
+    namespace = f"test-{uuid.uuid4().hex}"
+    path, copy = str(tmp_path / "doc.pdf"), str(tmp_path / "copy.pdf")
+    write_pdf(path, PAGES)
+    write_pdf(copy, PAGES)
+    rag.ingest_pdf(path, namespace)
+    rag.ingest_pdf(copy, namespace)
+    shared = live_ids(namespace)
+
+    write_pdf(path, ["nu xi omicron pi " * 40])
+    rag.ingest_pdf(path, namespace)
+    assert shared < live_ids(namespace)  # copy.pdf still points at the old content
+
+def test_replacing_with_already_indexed_content_invalidates_answers(tmp_path, uploads):
+    from src.answer_cache import answer_cache
+    namespace = f"test-{uuid.uuid4().hex}"
+    path, other = str(tmp_path / "doc.pdf"), str(tmp_path / "other.pdf")
+    write_pdf(path, PAGES)
+    write_pdf(other, ["nu xi omicron pi " * 40])
+    rag.ingest_pdf(path, namespace)
+    rag.ingest_pdf(other, namespace)
+    answer_cache.store(namespace, [1.0, 0.0], "cites doc.pdf", cost_ms=100.0)
+
+    write_pdf(path, ["nu xi omicron pi " * 40])  # doc.pdf now has other.pdf's content
+    rag.ingest_pdf(path, namespace)
+    assert rag.manifest.chunk_ids(namespace, rag.hash_file(other)) == live_ids(namespace)
+    assert answer_cache.lookup(namespace, [1.0, 0.0]) is None
@@ -0,0 +1,13 @@
+from src.lexical import BM25Index, tokenize
+
+def test_tokenize_keeps_terms_and_drops_stopwords():
+    assert tokenize("What is the value of x_1 in Q3 (see 3.2)?") == ["value", "x_1", "q3", "see", "3.2"]
+
+def test_stopword_only_overlap_is_not_a_hit(tmp_path):
+    index = BM25Index(str(tmp_path / "lexical.sqlite3"))
+    index.add("ns", [
+        ("c1", "The report is about the revenue of the company in the last year."),
+        ("c2", "Employees were hired in Europe and in Asia."),
+    ])
+    assert index.search("ns", "What is the capital of France?") == []
+    assert [cid for cid, _ in index.search("ns", "revenue of the company")] == ["c1"]
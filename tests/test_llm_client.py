@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.llm_client import CircuitBreaker, CircuitOpenError, LLMClient
+
+class Chain:
+    """
+    Stand-in for `prompt | llm`: each call takes the next (kind, delay) from
+    `plan` ("ok" by default). "503" fails with a retryable overload error,
+    "400" with a bad request; anything else streams three chunks.
+    """
+
+    def __init__(self, plan=()):
+        self.plan = list(plan)
+        self.calls = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            return self.plan.pop(0) if self.plan else ("ok", 0.0)
+
+    @staticmethod
+    def _check(kind):
+        if kind == "503":
+            raise RuntimeError("503 The model is overloaded")
+        if kind == "400":
+            raise ValueError("400 Invalid argument")
+
+    def stream(self, inputs):
+        kind, delay = self._next()
+        time.sleep(delay)
+        self._check(kind)
+        for token in ("a", "b", "c"):
+            yield f"{kind}:{token}"
+
+    def invoke(self, inputs):
+        return "".join(self.stream(inputs))
+
+    async def astream(self, inputs):
+        kind, delay = self._next()
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self._check(kind)
+        for token in ("a", "b", "c"):
+            yield f"{kind}:{token}"
+
+    async def ainvoke(self, inputs):
+        return "".join([chunk async for chunk in self.astream(inputs)])
+
+def client(**kwargs):
+    settings = {"backoff_base": 0.001, "backoff_max": 0.01, "hedging": False, **kwargs}
+    return LLMClient(**settings)
+
+# --- retries ---
+
+def test_retries_overload_errors_then_succeeds():
+    llm, chain = client(max_retries=3), Chain([("503", 0), ("503", 0)])
+    assert list(llm.stream(chain, {})) == ["ok:a", "ok:b", "ok:c"]
+    assert chain.calls == 3 and llm.stats()["retries"] == 2
+
+def test_retry_budget_is_bounded():
+    llm, chain = client(max_retries=2, breaker_failures=100), Chain([("503", 0)] * 10)
+    with pytest.raises(RuntimeError, match="503"):
+        llm.invoke(chain, {})
+    assert chain.calls == 3 and llm.stats()["failures"] == 1
+
+def test_bad_requests_are_not_retried():
+    llm, chain = client(max_retries=3), Chain([("400", 0)])
+    with pytest.raises(ValueError):
+        llm.invoke(chain, {})
+    assert chain.calls == 1 and llm.breaker.state == "closed"
+
+def test_backoff_is_full_jitter_under_the_cap():
+    llm = client(backoff_base=0.5, backoff_max=4.0)
+    for attempt in range(6):
+        assert 0.0 <= llm.backoff(attempt) <= min(4.0, 0.5 * 2 ** attempt)
+
+# --- circuit breaker ---
+
+def test_breaker_open_half_open_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.before_call() is True  # the trial
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError, match="trial"):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.before_call() is False
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+def open_breaker(llm):
+    with pytest.raises(RuntimeError):
+        llm.invoke(Chain([("503", 0)]), {})
+    assert llm.breaker.state == "open"
+    time.sleep(llm.breaker.reset_seconds + 0.01)
+
+def test_cancelled_async_trial_reopens_the_breaker():
+    llm = client(max_retries=0, breaker_failures=1, breaker_reset_seconds=0.05)
+    open_breaker(llm)
+
+    async def cancel_trial():
+        task = asyncio.create_task(llm.ainvoke(Chain([("slow", 10.0)]), {}))
+        await asyncio.sleep(0.02)
+        assert llm.breaker.state == "half_open"
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert llm.breaker.state == "open"
+    time.sleep(0.06)
+    assert llm.invoke(Chain(), {}) == "ok:aok:bok:c"  # a new trial is let through
+    assert llm.breaker.state == "closed"
+
+def test_interrupted_sync_trial_reopens_the_breaker(monkeypatch):
+    llm = client(max_retries=0, breaker_failures=1, breaker_reset_seconds=0.05)
+    open_breaker(llm)
+
+    class Rerun(BaseException):
+        """Like Streamlit's rerun/stop exceptions."""
+
+    def interrupted(make_iter, kind):
+        raise Rerun()
+
+    monkeypatch.setattr(llm, "_race", interrupted)
+    with pytest.raises(Rerun):
+        llm.invoke(Chain(), {})
+    assert llm.breaker.state == "open" and not llm.breaker._trial_running
+
+# --- hedging ---
+
+def test_sync_hedge_wins_over_a_slow_request():
+    llm = client(hedging=True, hedge_default_delay=0.05)
+    chain = Chain([("slow", 1.0), ("fast", 0.0)])
+    start = time.perf_counter()
+    assert list(llm.stream(chain, {})) == ["fast:a", "fast:b", "fast:c"]
+    assert time.perf_counter() - start < 0.5
+    stats = llm.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+def test_async_hedge_wins_and_the_loser_is_cancelled():
+    llm = client(hedging=True, hedge_default_delay=0.05)
+    chain = Chain([("slow", 1.0), ("fast", 0.0)])
+
+    async def run():
+        result = await llm.ainvoke(chain, {})
+        await asyncio.sleep(0.01)  # let the cancellation land
+        return result
+
+    assert asyncio.run(run()) == "fast:afast:bfast:c"
+    assert chain.cancelled == 1 and llm.stats()["hedge_wins"] == 1
+
+def test_original_wins_when_the_hedge_is_slower():
+    llm = client(hedging=True, hedge_default_delay=0.05)
+    chain = Chain([("first", 0.1), ("hedge", 1.0)])
+    assert asyncio.run(llm.ainvoke(chain, {})) == "first:afirst:bfirst:c"
+    stats = llm.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 0
+
+def test_no_hedge_without_spare_capacity():
+    llm = client(hedging=True, hedge_default_delay=0.02, max_concurrency=1)
+    chain = Chain([("slow", 0.1)])
+    assert llm.invoke(chain, {}) == "slow:aslow:bslow:c"
+    assert chain.calls == 1 and llm.stats()["hedges"] == 0
+
+# --- concurrency limit ---
+
+def test_sync_and_async_callers_share_one_limit():
+    llm = client(max_concurrency=1)
+    release = threading.Event()
+
+    class Blocking(Chain):
+        def stream(self, inputs):
+            release.wait(5)
+            yield "sync"
+
+    holder = threading.Thread(target=lambda: llm.invoke(Blocking(), {}))
+    holder.start()
+    time.sleep(0.05)
+
+    async def ask(timeout):
+        return await asyncio.wait_for(llm.ainvoke(Chain(), {}), timeout)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(ask(0.1))  # the only slot is taken by the sync call
+    release.set()
+    holder.join()
+    assert asyncio.run(ask(1.0)) == "ok:aok:bok:c"
@@ -0,0 +1,92 @@
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from src.local_store import LocalIndex
+
+def unit(i: int, dim: int = 8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector.tolist()
+
+def ids(response):
+    return [m["id"] for m in response["matches"]]
+
+def test_upsert_query_delete(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[("a", unit(0), {"n": 1}), ("b", unit(1), {"n": 2})], namespace="ns")
+    response = index.query(unit(1), top_k=2, namespace="ns", include_metadata=True)
+    assert ids(response) == ["b", "a"]
+    assert response["matches"][0]["score"] > 0.99 and response["matches"][0]["metadata"] == {"n": 2}
+
+    index.delete(ids=["b"], namespace="ns")
+    assert ids(index.query(unit(1), top_k=2, namespace="ns")) == ["a"]
+    assert ids(index.query(unit(0), top_k=2, namespace="other")) == []
+
+def test_upsert_overwrites_and_survives_reload(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[("a", unit(0), {"v": 1}), ("b", unit(1), {})], namespace="ns")
+    index.upsert(vectors=[("a", unit(2), {"v": 2})], namespace="ns")
+    index.delete(ids=["b"], namespace="ns")
+
+    reloaded = LocalIndex(str(tmp_path))
+    response = reloaded.query(unit(2), top_k=5, namespace="ns", include_metadata=True)
+    assert ids(response) == ["a"]
+    assert response["matches"][0]["metadata"] == {"v": 2}
+    assert reloaded.list_namespaces() == ["ns"]
+
+def test_duplicate_ids_in_one_batch_keep_the_last(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[("a", unit(0), {"v": 1}), ("b", unit(1), {}), ("a", unit(2), {"v": 2})], namespace="ns")
+    for current in (index, LocalIndex(str(tmp_path))):
+        response = current.query(unit(2), top_k=5, namespace="ns", include_metadata=True)
+        assert sorted(ids(response)) == ["a", "b"]
+        assert response["matches"][0]["metadata"] == {"v": 2}
+
+def test_delete_all(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[("a", unit(0), {})], namespace="ns")
+    index.delete(delete_all=True, namespace="ns")
+    assert ids(index.query(unit(0), top_k=5, namespace="ns")) == []
+    assert index.list_namespaces() == []
+
+def test_compaction_drops_dead_rows_and_keeps_results(tmp_path):
+    index = LocalIndex(str(tmp_path), compact_ratio=0.5, compact_min_rows=4)
+    index.upsert(vectors=[(f"c{i}", unit(i), {"i": i}) for i in range(8)], namespace="ns")
+    index.upsert(vectors=[("c0", unit(0), {"i": "new"})], namespace="ns")
+    index.delete(ids=["c1", "c2", "c3", "c4"], namespace="ns")  # 5 of 9 rows dead -> compaction
+
+    ns = index.namespace("ns")
+    assert len(ns.ids) == 4 and ns.live.all()
+    assert os.path.getsize(os.path.join(ns.path, "vectors.f32")) == 4 * 8 * 4
+    assert not os.path.exists(os.path.join(ns.path, "deleted.txt"))
+    for current in (index, LocalIndex(str(tmp_path))):
+        response = current.query(unit(0), top_k=10, namespace="ns", include_metadata=True)
+        assert sorted(ids(response)) == ["c0", "c5", "c6", "c7"]
+        assert response["matches"][0]["metadata"] == {"i": "new"}
+    assert index.list_namespaces() == ["ns"]
+
+def test_interrupted_compaction_is_completed_on_load(tmp_path):
+    index = LocalIndex(str(tmp_path), compact_ratio=0.5, compact_min_rows=2)
+    index.upsert(vectors=[("a", unit(0), {}), ("b", unit(1), {}), ("c", unit(2), {})], namespace="ns")
+    path = index.namespace("ns").path
+    # Crash after the first rename: old files moved aside, new ones complete but not in place
+    shutil.copytree(path, path + "#compacting")
+    os.rename(path, path + "#replaced")
+    assert sorted(ids(LocalIndex(str(tmp_path)).query(unit(0), top_k=5, namespace="ns"))) == ["a", "b", "c"]
+    assert sorted(os.listdir(tmp_path)) == ["ns"]
+
+def test_delete_all_waits_for_writes_in_flight(tmp_path):
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[("a", unit(0), {})], namespace="ns")
+    stale = index.namespace("ns")
+    with stale.lock:  # a writer holding the namespace
+        deleter = threading.Thread(target=lambda: index.delete(delete_all=True, namespace="ns"))
+        deleter.start()
+        time.sleep(0.05)
+        assert deleter.is_alive()
+    deleter.join()
+    assert stale.closed
+    index.upsert(vectors=[("b", unit(1), {})], namespace="ns")  # lands in a fresh namespace
+    assert ids(LocalIndex(str(tmp_path)).query(unit(1), top_k=5, namespace="ns")) == ["b"]
@@ -0,0 +1,38 @@
+import pytest
+from src.namespaces import NamespaceRegistry, NamespaceSweeper
+
+def test_sweeper_without_rate_limit(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / "namespaces.sqlite3"))
+    for name in ("s1", "s2", "s3"):
+        registry.register(name, ephemeral=True)
+    deleted = []
+    sweeper = NamespaceSweeper(
+        registry, delete_fn=lambda ns: deleted.append(ns) or True,
+        ttl_seconds=-1, max_deletes_per_second=0,
+    )
+    assert sorted(sweeper.sweep_once()) == ["s1", "s2", "s3"]
+    assert sorted(deleted) == ["s1", "s2", "s3"]
+
+def test_sweeper_rejects_negative_rate(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / "namespaces.sqlite3"))
+    with pytest.raises(ValueError):
+        NamespaceSweeper(registry, delete_fn=lambda ns: True, max_deletes_per_second=-1)
+
+def test_usage_after_delete_is_collected_again(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / "namespaces.sqlite3"))
+    registry.register("s1", ephemeral=True)
+    registry.add_usage("s1", 10, 1000)
+    registry.forget("s1")
+
+    registry.add_usage("s1", 5, 500)  # an ingest batch that landed after End Session
+    row = registry.get("s1")
+    assert row["ephemeral"] == 1 and row["chunks"] == 5
+    assert registry.idle(older_than=1.0, limit=10) == ["s1"]
+
+def test_register_clears_the_tombstone(tmp_path):
+    registry = NamespaceRegistry(str(tmp_path / "namespaces.sqlite3"))
+    registry.forget("default")
+    registry.register("default")
+    registry.add_usage("default", 3, 300)
+    row = registry.get("default")
+    assert row["ephemeral"] == 0 and row["chunks"] == 3 and row["last_access"] > 1.0
@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+import numpy as np
+from src.onnx_embeddings import OnnxEmbeddings
+
+class FakeSession:
+    """Hidden state of each token is (id, 1, 0, ...); padding tokens get a large value."""
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.widths = []
+
+    def run(self, _, feeds):
+        ids, mask = feeds["input_ids"], feeds["attention_mask"]
+        self.widths.append(ids.shape[1])
+        hidden = np.zeros((*ids.shape, self.dimension), dtype=np.float32)
+        hidden[:, :, 0] = np.where(mask == 1, ids, 1000)
+        hidden[:, :, 1] = 1.0
+        return [hidden]
+
+def fake_model(dimension=4, batch_size=2):
+    model = object.__new__(OnnxEmbeddings)  # skips loading onnxruntime and a model file
+    model.batch_size = batch_size
+    model.dimension = dimension
+    model.session = FakeSession(dimension)
+    model._input_names = {"input_ids", "attention_mask", "token_type_ids"}
+    # One token per word, whose id is the word's length
+    model.tokenizer = SimpleNamespace(
+        encode_batch=lambda texts: [SimpleNamespace(ids=[len(w) for w in t.split()]) for t in texts]
+    )
+    return model
+
+def test_vectors_have_the_index_shape_and_ignore_padding():
+    model = fake_model()
+    texts = ["a much longer question about revenue", "hi", "short one"]
+    vectors = model.embed_documents(texts)
+    assert np.array(vectors).shape == (3, 4)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    # Same vector alone or padded in a batch, and returned in input order
+    for text, vector in zip(texts, vectors):
+        assert np.allclose(model.embed_query(text), vector, atol=1e-6)
+    assert model.embed_documents([]) == []
+
+def test_batches_are_sorted_by_length():
+    model = fake_model(batch_size=2)
+    model.embed_documents(["one two three four five", "a", "b c", "d e f g h i"])
+    assert model.session.widths == [2, 6]  # {1, 2} and {5, 6} tokens instead of {5, 1} and {2, 6}
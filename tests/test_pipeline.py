@@ -0,0 +1,64 @@
+import threading
+import time
+import pytest
+from src.pipeline import BoundedExecutor, batched, prefetch
+
+def test_batched_keeps_the_remainder():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
+
+def test_prefetch_runs_ahead_by_at_most_maxsize():
+    produced = []
+
+    def pages():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    items = prefetch(pages(), maxsize=2)
+    assert next(items) == 0
+    time.sleep(0.2)
+    # One item consumed, two buffered, one blocked on the full queue
+    assert len(produced) <= 4
+    assert list(items) == list(range(1, 10))
+
+def test_prefetch_reraises_producer_errors():
+    def pages():
+        yield 1
+        raise RuntimeError("broken page")
+
+    items = prefetch(pages(), maxsize=4)
+    assert next(items) == 1
+    with pytest.raises(RuntimeError, match="broken page"):
+        next(items)
+
+def test_bounded_executor_limits_pending_work():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    with BoundedExecutor(max_workers=2, max_pending=3) as executor:
+        for _ in range(10):
+            executor.submit(work)
+            assert len(executor._futures) <= 3
+        executor.wait()
+    assert peak[0] <= 2
+
+def test_bounded_executor_surfaces_failures():
+    def fail():
+        raise ValueError("upsert failed")
+
+    # Raised by a later submit, or at the latest by wait()
+    with BoundedExecutor(max_workers=1, max_pending=1) as executor:
+        with pytest.raises(ValueError, match="upsert failed"):
+            executor.submit(fail)
+            for _ in range(5):
+                executor.submit(time.sleep, 0.01)
+            executor.wait()
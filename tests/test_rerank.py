@@ -0,0 +1,36 @@
+import numpy as np
+from langchain_core.documents import Document
+from src.rerank import estimate_tokens, mmr, pack_context, reciprocal_rank_fusion
+
+def test_mmr_prefers_diverse_candidates():
+    query = np.array([1.0, 1.0, 0.0])
+    candidates = np.array([
+        [1.0, 0.8, 0.0],   # best match
+        [1.0, 0.78, 0.0],  # near-duplicate of the best
+        [0.3, 1.0, 0.0],   # less relevant, but different
+    ])
+    assert mmr(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+    assert mmr(query, candidates, k=2, lambda_mult=1.0) == [0, 1]  # pure relevance
+    assert mmr(query, candidates, k=10, lambda_mult=0.5) == [0, 2, 1]
+    assert mmr(query, np.zeros((0, 3)), k=3) == []
+
+def test_pack_context_keeps_rank_order_within_budget():
+    docs = [Document(page_content=text) for text in ("a" * 400, "b" * 400, "c" * 40)]
+    packed = pack_context(docs, token_budget=estimate_tokens("a" * 400) + estimate_tokens("c" * 40))
+    assert [d.page_content[0] for d in packed] == ["a", "c"]
+
+def test_pack_context_truncates_an_oversized_top_document():
+    docs = [Document(page_content="x" * 16000), Document(page_content="y" * 2000)]
+    packed = pack_context(docs, token_budget=3000)
+    assert len(packed) == 1 and len(packed[0].page_content) == 12000
+    assert sum(estimate_tokens(d.page_content) for d in packed) <= 3000 + 1
+
+def test_reciprocal_rank_fusion_orders_by_summed_reciprocal_rank():
+    vector = ["a", "b", "c"]
+    lexical = ["d", "c", "a"]
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+    assert [cid for cid, _ in fused] == ["a", "c", "d", "b"]
+    scores = dict(fused)
+    assert scores["a"] == 1 / 61 + 1 / 63
+    assert scores["b"] == 1 / 62
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,37 @@
+from collections import OrderedDict
+
+def test_embedding_model_is_loaded_on_first_use(monkeypatch, tmp_path):
+    from bench_pipeline import HashingEmbeddings
+    from src import rag
+    loads = []
+    monkeypatch.setattr(rag, "embedding_function", None)
+    monkeypatch.setattr(rag, "EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(rag, "create_embedding_model", lambda: loads.append(1) or (HashingEmbeddings(), "test-hashing"))
+    assert loads == []
+    model = rag.get_embedding_function()
+    assert rag.get_embedding_function() is model and loads == [1]
+    assert len(model.embed_query("revenue")) == len(HashingEmbeddings().embed_query("revenue"))
+
+def test_shared_store_is_created_once(embeddings):
+    from src import rag
+    store = rag.get_vectorstore()
+    assert rag.get_vectorstore() is store
+    assert rag.get_index() is store.index
+
+def test_retriever_cache_evicts_least_recently_used(embeddings, monkeypatch):
+    from src import rag
+    monkeypatch.setattr(rag, "RETRIEVER_CACHE_SIZE", 2)
+    monkeypatch.setattr(rag, "_retriever_cache", OrderedDict())
+    monkeypatch.setattr(rag, "_retriever_stats", dict(rag._retriever_stats, hits=0, misses=0, evictions=0))
+
+    first = rag.get_retriever("ns-a")
+    rag.get_retriever("ns-b")
+    assert rag.get_retriever("ns-a") is first  # now most recently used
+    rag.get_retriever("ns-c")  # evicts ns-b
+    assert list(rag._retriever_cache) == ["ns-a", "ns-c"]
+    assert rag.get_retriever("ns-a") is first
+
+    stats = rag.get_retriever_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["cached"]) == (2, 3, 1, 2)
+    rag.invalidate_retriever("ns-a")
+    assert rag.get_retriever("ns-a") is not first
@@ -0,0 +1,16 @@
+from src import graph
+from src.config import ROUTE_STRONG_SCORE, ROUTE_WEAK_SCORE
+
+def test_choose_route():
+    assert graph.choose_route("", []) == "web"
+    assert graph.choose_route("ctx", [ROUTE_STRONG_SCORE + 0.05]) == "docs"
+    assert graph.choose_route("ctx", [ROUTE_WEAK_SCORE - 0.05]) == "web"
+    assert graph.choose_route("ctx", [ROUTE_WEAK_SCORE - 0.05], lexical_hits=2) == "combined"
+    assert graph.choose_route("ctx", [(ROUTE_WEAK_SCORE + ROUTE_STRONG_SCORE) / 2]) == "combined"
+
+def test_speculation_covers_borderline_docs_route(monkeypatch):
+    monkeypatch.setattr(graph, "SPECULATIVE_SEARCH", True)
+    borderline = ROUTE_STRONG_SCORE + 0.05
+    assert graph.choose_route("ctx", [borderline]) == "docs"
+    assert graph.should_speculate({"metrics": {"top_score": borderline}})
+    assert not graph.should_speculate({"metrics": {"top_score": 0.9}})
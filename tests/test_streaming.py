@@ -0,0 +1,35 @@
+import pytest
+from src.graph import SentinelFilter
+
+def feed_all(pieces):
+    sentinel = SentinelFilter()
+    shown = "".join(sentinel.feed(p) for p in pieces)
+    return shown, sentinel
+
+@pytest.mark.parametrize("pieces", [
+    ["NO_ANSWER"],
+    ["NO", "_ANS", "WER"],
+    ["N", "O", "_", "A", "N", "S", "W", "E", "R"],
+    ["  \n", "NO_", "ANSWER", "."],
+])
+def test_sentinel_split_across_tokens_is_never_shown(pieces):
+    shown, sentinel = feed_all(pieces)
+    assert shown == "" and sentinel.no_answer
+
+def test_answer_is_released_once_it_cannot_be_the_sentinel():
+    sentinel = SentinelFilter()
+    assert sentinel.feed("NO") == ""           # could still be NO_ANSWER
+    assert sentinel.feed("TE:") == "NOTE:"     # held-back text comes out in one piece
+    assert sentinel.feed(" the report") == " the report"
+    assert not sentinel.no_answer
+
+def test_answer_streams_from_the_first_token():
+    shown, sentinel = feed_all(["The", " revenue", " grew."])
+    assert shown == "The revenue grew." and not sentinel.no_answer
+
+def test_sentinel_after_text_withdraws_the_answer():
+    sentinel = SentinelFilter()
+    assert sentinel.feed("Sorry, ") == "Sorry, "
+    assert sentinel.feed("NO_ANS") == "NO_ANS"
+    assert sentinel.feed("WER") == ""
+    assert sentinel.no_answer
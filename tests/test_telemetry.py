@@ -0,0 +1,31 @@
+import importlib
+from src import telemetry
+
+def test_counters_and_histograms_render():
+    registry = telemetry.Registry()
+    counter = registry.counter("t_total", "Test counter.", labels=("kind",))
+    histogram = registry.histogram("t_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    histogram.observe(0.5)
+    text = registry.render()
+    assert 't_total{kind="a"} 3' in text
+    assert 't_seconds_bucket{le="0.1"} 0' in text and 't_seconds_bucket{le="1"} 1' in text
+    assert "t_seconds_count 1" in text
+
+def test_callback_metrics_are_read_at_scrape_time():
+    registry = telemetry.Registry()
+    value = {"n": 1}
+    registry.callback("t_entries", "Test gauge.", lambda: value["n"])
+    assert "t_entries 1\n" in registry.render()
+    value["n"] = 5
+    assert "# TYPE t_entries gauge\nt_entries 5\n" in registry.render()
+
+def test_cache_stats_are_exported():
+    importlib.import_module("src.rag")  # registers the cache metrics
+    text = telemetry.registry.render()
+    for name in (
+        "chatdoc_retriever_cache_hits_total", "chatdoc_embedding_cache_misses_total",
+        "chatdoc_answer_cache_hits_total", "chatdoc_answer_cache_entries",
+    ):
+        assert f"\n{name} " in text